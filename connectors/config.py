@@ -74,6 +74,7 @@ def _default_config():
                 "chunk_size": 1000,
                 "max_concurrency": 5,
                 "chunk_max_mem_size": 5,
+                "chunk_flush_interval": 10,
                 "max_retries": DEFAULT_ELASTICSEARCH_MAX_RETRIES,
                 "retry_interval": DEFAULT_ELASTICSEARCH_RETRY_INTERVAL,
                 "concurrent_downloads": 10,
@@ -83,6 +84,7 @@ def _default_config():
             "retry_interval": DEFAULT_ELASTICSEARCH_RETRY_INTERVAL,
             "retry_on_timeout": True,
             "request_timeout": 120,
+            "http_compress": False,
             "max_wait_duration": 120,
             "initial_backoff_duration": 1,
             "backoff_multiplier": 2,
@@ -5,15 +5,19 @@
 #
 import functools
 import logging
+import re
 import time
 from enum import Enum
 
+import orjson
 from elastic_transport import ConnectionTimeout
 from elastic_transport.client_utils import url_to_node_config
 from elasticsearch import ApiError, AsyncElasticsearch, ConflictError
 from elasticsearch import (
     ConnectionError as ElasticConnectionError,
 )
+from elasticsearch.serializer import JsonSerializer, NdjsonSerializer
+from elasticsearch.serializer import OrjsonSerializer as _OrjsonSerializer
 
 from connectors import __version__
 from connectors.config import (
@@ -41,6 +45,50 @@ class License(Enum):
 
 USER_AGENT_BASE = f"elastic-connectors-{__version__}"
 
+# orjson parses integers that do not fit in 64 bits as floats, they have at
+# least 20 digits
+LONG_DIGITS_RUN = re.compile(rb"\d{20}")
+
+
+class OrjsonSerializer(_OrjsonSerializer):
+    """The client's orjson serializer, which also accepts non-string keys.
+
+    orjson rejects lone surrogates and integers above 64 bits, and reads such
+    integers back as floats, such values are serialized and deserialized with
+    the json module like the default serializer does.
+    """
+
+    def json_dumps(self, data):
+        try:
+            return orjson.dumps(
+                data,
+                default=self.default,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return JsonSerializer.json_dumps(self, data)
+
+    def json_loads(self, data):
+        if LONG_DIGITS_RUN.search(data) is None:
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                pass
+        return JsonSerializer.json_loads(self, data)
+
+
+class OrjsonNdjsonSerializer(NdjsonSerializer, OrjsonSerializer):
+    """NDJSON serializer relying on orjson.
+
+    Bodies that are already serialized, like the `Sink` bulk payloads, are sent
+    as is instead of being copied line by line.
+    """
+
+    def dumps(self, data):
+        if isinstance(data, bytes) and data.endswith(b"\n"):
+            return data
+        return super().dumps(data)
+
 
 class ESClient:
     user_agent = f"{USER_AGENT_BASE}/service"
@@ -64,9 +112,17 @@ class ESClient:
             "hosts": [self.host],
             "request_timeout": config.get("request_timeout", 120),
             "retry_on_timeout": config.get("retry_on_timeout", True),
+            "http_compress": config.get("http_compress", False),
+            "serializers": {
+                OrjsonSerializer.mimetype: OrjsonSerializer(),
+                OrjsonNdjsonSerializer.mimetype: OrjsonNdjsonSerializer(),
+            },
         }
         logger.debug(f"Initial Elasticsearch node configuration is {self.host}")
 
+        if "connections_per_node" in config:
+            options["connections_per_node"] = config["connections_per_node"]
+
         if "api_key" in config:
             logger.debug(f"Connecting with an API Key ({config['api_key'][:5]}...)")
             options["api_key"] = config["api_key"]
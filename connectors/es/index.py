@@ -5,12 +5,13 @@
 #
 from functools import partial
 
-from elasticsearch import ApiError
+from elasticsearch import ApiError, NotFoundError
 
 from connectors.es import ESClient
 from connectors.logger import logger
 
 DEFAULT_PAGE_SIZE = 100
+PIT_KEEP_ALIVE = "1m"
 
 
 class DocumentNotFoundError(Exception):
@@ -219,11 +220,7 @@ class ESIndex(ESClient):
 
     async def fetch_response_by_id(self, doc_id):
         try:
-            if not self.serverless:
-                await self._retrier.execute_with_retry(
-                    partial(self.client.indices.refresh, index=self.index_name)
-                )
-
+            # GET is realtime, it does not need a refresh to see the latest write
             resp = await self._retrier.execute_with_retry(
                 partial(self.client.get, index=self.index_name, id=doc_id)
             )
@@ -286,43 +283,75 @@ class ESIndex(ESClient):
         Returns:
             Iterator
         """
-        if not self.serverless:
-            await self._retrier.execute_with_retry(
-                partial(self.client.indices.refresh, index=self.index_name)
-            )
-
         if query is None:
             query = {"match_all": {}}
 
-        count = 0
-        offset = 0
+        # `_shard_doc` is a unique tiebreaker, so each page resumes right after
+        # the last hit of the previous one instead of skipping `from` hits again
+        sort = [*(sort or []), {"_shard_doc": "asc"}]
 
-        while True:
-            try:
-                resp = await self._retrier.execute_with_retry(
-                    partial(
-                        self.client.search,
-                        index=self.index_name,
-                        query=query,
-                        sort=sort,
-                        from_=offset,
-                        size=page_size,
-                        expand_wildcards="hidden",
-                        seq_no_primary_term=True,
+        pit_id = await self._open_point_in_time()
+        search_after = None
+
+        try:
+            while True:
+                try:
+                    try:
+                        resp = await self._search_page(
+                            pit_id, query, sort, search_after, page_size
+                        )
+                    except NotFoundError:
+                        # the point in time expires when the caller spends more
+                        # than its keep alive on a page, resume in a new one, hits
+                        # updated meanwhile can be missed or seen again like with
+                        # `from` paging
+                        logger.debug(
+                            f"Point in time on {self.index_name} expired, opening a new one"
+                        )
+                        pit_id = await self._open_point_in_time()
+                        resp = await self._search_page(
+                            pit_id, query, sort, search_after, page_size
+                        )
+                except ApiError as e:
+                    logger.error(
+                        f"Elasticsearch returned {e.status_code} for 'GET {self.index_name}/_search' with body:"
                     )
-                )
+                    logger.error(e.body, exc_info=True)
+                    raise
+
+                pit_id = resp.get("pit_id", pit_id)
+                hits = resp["hits"]["hits"]
+                for hit in hits:
+                    yield self._create_object(hit)
+                if len(hits) < page_size:
+                    break
+                search_after = hits[-1]["sort"]
+        finally:
+            try:
+                await self.client.close_point_in_time(id=pit_id)
             except ApiError as e:
-                logger.error(
-                    f"Elasticsearch returned {e.status_code} for 'GET {self.index_name}/_search' with body:"
-                )
-                logger.error(e.body, exc_info=True)
-                raise
-
-            hits = resp["hits"]["hits"]
-            total = resp["hits"]["total"]["value"]
-            count += len(hits)
-            for hit in hits:
-                yield self._create_object(hit)
-            if count >= total:
-                break
-            offset += len(hits)
+                logger.debug(f"Failed to close point in time on {self.index_name}: {e}")
+
+    async def _open_point_in_time(self):
+        pit = await self._retrier.execute_with_retry(
+            partial(
+                self.client.open_point_in_time,
+                index=self.index_name,
+                keep_alive=PIT_KEEP_ALIVE,
+                expand_wildcards="hidden",
+            )
+        )
+        return pit["id"]
+
+    async def _search_page(self, pit_id, query, sort, search_after, page_size):
+        return await self._retrier.execute_with_retry(
+            partial(
+                self.client.search,
+                pit={"id": pit_id, "keep_alive": PIT_KEEP_ALIVE},
+                query=query,
+                sort=sort,
+                search_after=search_after,
+                size=page_size,
+                seq_no_primary_term=True,
+            )
+        )
@@ -10,12 +10,14 @@ from elasticsearch import ApiError
 from elasticsearch import (
     NotFoundError as ElasticNotFoundError,
 )
-from elasticsearch.helpers import async_scan
 
 from connectors.es import TIMESTAMP_FIELD
 from connectors.es.client import ESClient
 from connectors.logger import logger
 
+EXISTING_DOCS_PAGE_SIZE = 1000
+EXISTING_DOCS_PIT_KEEP_ALIVE = "5m"
+
 
 class ESManagementClient(ESClient):
     """
@@ -130,6 +132,12 @@ class ESManagementClient(ESClient):
             partial(self.client.indices.exists, index=index_name)
         )
 
+    async def count_documents(self, index_name):
+        response = await self._retrier.execute_with_retry(
+            partial(self.client.count, index=index_name)
+        )
+        return response["count"]
+
     async def get_index_or_alias(self, index_name, ignore_unavailable=False):
         """
         Get index definition (mappings and settings) by its name or its alias.
@@ -169,6 +177,49 @@ class ESManagementClient(ESClient):
 
         return None
 
+    async def get_index_settings(self, index_name, names):
+        """Returns the values of the `names` settings of an index.
+
+        Settings that are not explicitly set on the index are `None`.
+        """
+        response = await self._retrier.execute_with_retry(
+            partial(
+                self.client.indices.get_settings,
+                index=index_name,
+                name=names,
+                flat_settings=True,
+            )
+        )
+        # the response is keyed by concrete index, `index_name` can be an alias
+        settings = next(iter(response.values()), {}).get("settings", {})
+        return {name: settings.get(name) for name in names}
+
+    async def update_index_settings(self, index_name, settings):
+        """Updates dynamic settings of an index, `None` values reset a setting to its default."""
+        return await self._retrier.execute_with_retry(
+            partial(
+                self.client.indices.put_settings,
+                index=index_name,
+                settings=settings,
+            )
+        )
+
+    async def get_index_meta(self, index_name):
+        """Returns the `_meta` of the mappings of an index, `{}` if it has none."""
+        response = await self._retrier.execute_with_retry(
+            partial(self.client.indices.get_mapping, index=index_name)
+        )
+        # the response is keyed by concrete index, `index_name` can be an alias
+        for index in response.values():
+            return index["mappings"].get("_meta", {})
+        return {}
+
+    async def update_index_meta(self, index_name, meta):
+        """Replaces the `_meta` of the mappings of an index."""
+        return await self._retrier.execute_with_retry(
+            partial(self.client.indices.put_mapping, index=index_name, meta=meta)
+        )
+
     async def upsert(self, _id, index_name, doc):
         return await self._retrier.execute_with_retry(
             partial(
@@ -179,14 +230,16 @@ class ESManagementClient(ESClient):
             )
         )
 
-    async def bulk_insert(self, operations, pipeline):
-        return await self._retrier.execute_with_retry(
-            partial(
-                self.client.bulk,
-                operations=operations,
-                pipeline=pipeline,
-            )
+    async def bulk_insert(self, operations, pipeline, with_retries=True):
+        bulk = partial(
+            self.client.bulk,
+            operations=operations,
+            pipeline=pipeline,
         )
+        if not with_retries:
+            # the caller has its own retry policy
+            return await bulk()
+        return await self._retrier.execute_with_retry(bulk)
 
     async def yield_existing_documents_metadata(self, index):
         """Returns an iterator on the `id` and `_timestamp` fields of all documents in an index.
@@ -202,14 +255,50 @@ class ESManagementClient(ESClient):
         if not await self.index_exists(index):
             return
 
-        async for doc in async_scan(
-            client=self.client, index=index, _source=["id", TIMESTAMP_FIELD]
-        ):
-            source = doc["_source"]
-            doc_id = source.get("id", doc["_id"])
-            timestamp = source.get(TIMESTAMP_FIELD)
+        pit = await self._retrier.execute_with_retry(
+            partial(
+                self.client.open_point_in_time,
+                index=index,
+                keep_alive=EXISTING_DOCS_PIT_KEEP_ALIVE,
+            )
+        )
+        pit_id = pit["id"]
+        search_after = None
+
+        try:
+            while True:
+                # `_shard_doc` is the cheapest stable sort for a PIT: pages resume
+                # from the last sort value instead of re-sorting from the start
+                response = await self._retrier.execute_with_retry(
+                    partial(
+                        self.client.search,
+                        pit={"id": pit_id, "keep_alive": EXISTING_DOCS_PIT_KEEP_ALIVE},
+                        sort=[{"_shard_doc": "asc"}],
+                        search_after=search_after,
+                        size=EXISTING_DOCS_PAGE_SIZE,
+                        source=["id", TIMESTAMP_FIELD],
+                        track_total_hits=False,
+                    )
+                )
+                pit_id = response.get("pit_id", pit_id)
+                hits = response["hits"]["hits"]
+
+                for doc in hits:
+                    source = doc.get("_source", {})
+                    doc_id = source.get("id", doc["_id"])
+                    timestamp = source.get(TIMESTAMP_FIELD)
+
+                    yield doc_id, timestamp
+
+                if len(hits) < EXISTING_DOCS_PAGE_SIZE:
+                    break
 
-            yield doc_id, timestamp
+                search_after = hits[-1]["sort"]
+        finally:
+            try:
+                await self.client.close_point_in_time(id=pit_id)
+            except ApiError as e:
+                logger.debug(f"Failed to close point in time on {index}: {e}")
 
     async def get_connector_secret(self, connector_secret_id):
         secret = await self._retrier.execute_with_retry(
@@ -19,16 +19,23 @@ Elasticsearch <== Sink <== queue <== Extractor <== generator
 """
 
 import asyncio
-import copy
+import datetime
 import functools
+import io
 import logging
+import random
+import re
 import time
 
+from elastic_transport import ConnectionTimeout
+from elasticsearch import ApiError
+
 from connectors.config import (
     DEFAULT_ELASTICSEARCH_MAX_RETRIES,
     DEFAULT_ELASTICSEARCH_RETRY_INTERVAL,
 )
 from connectors.es import TIMESTAMP_FIELD
+from connectors.es.client import OrjsonSerializer
 from connectors.es.management_client import ESManagementClient
 from connectors.filtering.basic_rule import BasicRuleEngine, parse
 from connectors.logger import logger, tracer
@@ -39,6 +46,7 @@ from connectors.protocol.connectors import (
     INDEXED_DOCUMENT_VOLUME,
 )
 from connectors.utils import (
+    DEFAULT_CHUNK_FLUSH_INTERVAL,
     DEFAULT_CHUNK_MEM_SIZE,
     DEFAULT_CHUNK_SIZE,
     DEFAULT_CONCURRENT_DOWNLOADS,
@@ -46,14 +54,16 @@ from connectors.utils import (
     DEFAULT_MAX_CONCURRENCY,
     DEFAULT_QUEUE_MEM_SIZE,
     DEFAULT_QUEUE_SIZE,
+    CancellableSleeps,
     ConcurrentTasks,
     Counters,
     MemQueue,
+    RetryStrategy,
     aenumerate,
     get_size,
     iso_utc,
-    retryable,
     sanitize,
+    time_to_sleep_between_retries,
 )
 
 __all__ = ["SyncOrchestrator"]
@@ -87,12 +97,98 @@ ID_DUPLICATE = "_id_duplicates"
 # Successful results according to the docs: https://www.elastic.co/guide/en/elasticsearch/reference/current/docs-bulk.html#bulk-api-response-body
 SUCCESSFUL_RESULTS = ("created", "deleted", "updated")
 
+# Marks a document that is not in the index, as its timestamp can be `None`
+NOT_INDEXED = object()
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+ONE_MICROSECOND = datetime.timedelta(microseconds=1)
+# fractions of a second finer than datetimes can hold
+SUB_MICROSECOND_FRACTION = re.compile(r"[.,]\d{7}")
+
+# Hot loops only suspend on a full (or empty) queue, so they hand control back to
+# the event loop every that many items to let heartbeats and bulk calls run
+YIELD_EVERY = 1024
+
+# Sink stats are logged at most once per that many seconds
+STATS_LOG_INTERVAL = 1
+
+# Index settings that slow down the first load of an empty index: they are
+# applied for the duration of the sync and restored afterwards
+INITIAL_LOAD_INDEX_SETTINGS = {
+    "index.refresh_interval": "-1",
+    "index.number_of_replicas": 0,
+}
+# Key of the index `_meta` holding the settings to restore after the initial load
+SETTINGS_TO_RESTORE_META_KEY = "connectors_settings_to_restore"
+
+# Bulk items rejected with these statuses are sent again
+RETRYABLE_ITEM_STATUSES = (429, 500, 502, 503, 504)
+MAX_ITEM_RETRY_BACKOFF = 60
+
+
+# Bulk payloads are serialized like the client's request bodies: with orjson and
+# the client's conversions (dates, decimals, uuids...), falling back on the json
+# module for the values orjson rejects, so one odd document can't fail a sync
+_json_dumps = OrjsonSerializer().json_dumps
+
 
 def get_mib_size(obj):
     """Returns the size of ob in MiB"""
     return round(get_size(obj) / (1024 * 1024), 2)
 
 
+def timestamp_key(value):
+    """Returns a compact, comparable form of a `_timestamp` value.
+
+    ISO 8601 strings and datetimes become microseconds since the epoch, so the
+    same instant compares equal whatever its text representation. Naive values
+    are considered UTC. Anything else is returned as is, including strings with
+    digits past the microsecond, which parsing would drop: unchanged documents
+    are only skipped when that is certain.
+    """
+    if isinstance(value, str):
+        if SUB_MICROSECOND_FRACTION.search(value):
+            return value
+        try:
+            value = datetime.datetime.fromisoformat(
+                value[:-1] + "+00:00" if value.endswith("Z") else value
+            )
+        except ValueError:
+            return value
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return (value - EPOCH) // ONE_MICROSECOND
+    return value
+
+
+def _item_status(item):
+    for data in item.values():
+        return data.get("status")
+
+
+def _split_payload(operations, items):
+    """Splits an NDJSON bulk payload into the payload of each of its `items`.
+
+    Returns `None` when the items do not match the payload.
+    """
+    lines = operations.split(b"\n")
+    payloads = []
+    start = 0
+    for item in items:
+        if OP_DELETE in item:
+            end = start + 1
+        elif OP_INDEX in item or OP_UPDATE in item or OP_CREATE in item:
+            end = start + 2
+        else:
+            return None
+        if end >= len(lines):
+            return None
+        payloads.append(b"\n".join(lines[start:end]) + b"\n")
+        start = end
+    return payloads
+
+
 class UnsupportedJobType(Exception):
     pass
 
@@ -115,17 +211,21 @@ class ElasticsearchOverloadedError(Exception):
 class Sink:
     """Send bulk operations in batches by consuming a queue.
 
-    This class runs a coroutine that gets operations out of a `queue` and collects them to
-    build and send bulk requests using a `client`
+    This class runs a coroutine that gets operations out of a `queue` and serializes them
+    into an NDJSON payload, which is sent as a bulk request using a `client`
+
+    A payload is sent as soon as it holds `chunk_size` NDJSON lines, reaches `chunk_mem_size`
+    or is older than `chunk_flush_interval` seconds, whichever comes first.
 
     Arguments:
 
     - `client` -- an instance of `connectors.es.ESManagementClient`
     - `queue` -- an instance of `asyncio.Queue` to pull docs from
-    - `chunk_size` -- a maximum number of operations to send per request
+    - `chunk_size` -- a maximum number of NDJSON lines to send per request: two per index or update, one per delete
     - `pipeline` -- ingest pipeline settings to pass to the bulk API
-    - `chunk_mem_size` -- a maximum size in MiB for each bulk request
+    - `chunk_mem_size` -- a maximum size in MiB of the serialized payload of each bulk request
     - `max_concurrency` -- a maximum number of concurrent bulk requests
+    - `chunk_flush_interval` -- a maximum age in seconds of a pending bulk request
     """
 
     def __init__(
@@ -140,57 +240,68 @@ class Sink:
         retry_interval,
         logger_=None,
         enable_bulk_operations_logging=False,
+        chunk_flush_interval=DEFAULT_CHUNK_FLUSH_INTERVAL,
     ):
         self.client = client
         self.queue = queue
         self.chunk_size = chunk_size
         self.pipeline = pipeline
         self.chunk_mem_size = chunk_mem_size * 1024 * 1024
+        self.chunk_flush_interval = chunk_flush_interval
         self.bulk_tasks = ConcurrentTasks(max_concurrency=max_concurrency)
         self.max_retires = max_retries
         self.retry_interval = retry_interval
         self.error = None
         self._logger = logger_ or logger
         self._canceled = False
+        self._sleeps = CancellableSleeps()
         self._enable_bulk_operations_logging = enable_bulk_operations_logging
         self.counters = Counters()
+        self._stats_logged_at = float("-inf")
+        self._action_prefixes = {}
 
-    def _bulk_op(self, doc, operation=OP_INDEX):
-        doc_id = doc["_id"]
-        index = doc["_index"]
+    def _write_bulk_op(self, buffer, doc, operation=OP_INDEX):
+        """Writes the NDJSON lines of a bulk operation into `buffer`"""
+        if operation not in (OP_INDEX, OP_UPDATE, OP_DELETE):
+            raise TypeError(operation)
 
-        if operation == OP_INDEX:
-            return [{operation: {"_index": index, "_id": doc_id}}, doc["doc"]]
-        if operation == OP_UPDATE:
-            return [
-                {operation: {"_index": index, "_id": doc_id}},
-                {"doc": doc["doc"], "doc_as_upsert": True},
-            ]
-        if operation == OP_DELETE:
-            return [{operation: {"_index": index, "_id": doc_id}}]
+        buffer.write(self._action_prefix(operation, doc["_index"]))
+        buffer.write(_json_dumps(doc["_id"]))
+        buffer.write(b"}}\n")
 
-        raise TypeError(operation)
+        if operation == OP_INDEX:
+            buffer.write(_json_dumps(doc["doc"]))
+            buffer.write(b"\n")
+        elif operation == OP_UPDATE:
+            buffer.write(b'{"doc":')
+            buffer.write(_json_dumps(doc["doc"]))
+            buffer.write(b',"doc_as_upsert":true}\n')
+
+    def _action_prefix(self, operation, index):
+        """Returns the action line of `operation` on `index`, up to the document id.
+
+        The index is the same for a whole sync, so the prefix is serialized once
+        per operation instead of building an action dict for every document.
+        """
+        prefix = self._action_prefixes.get((operation, index))
+        if prefix is None:
+            # b'{"op":{"_index":"index"}}' -> b'{"op":{"_index":"index","_id":'
+            prefix = _json_dumps({operation: {"_index": index}})[:-2] + b',"_id":'
+            self._action_prefixes[(operation, index)] = prefix
+        return prefix
 
     @tracer.start_as_current_span("_bulk API call", slow_log=1.0)
     async def _batch_bulk(self, operations, stats):
-        # TODO: make this retry policy work with unified retry strategy
-        @retryable(retries=self.max_retires, interval=self.retry_interval)
-        async def _bulk_api_call():
-            return await self.client.client.bulk(
-                operations=operations, pipeline=self.pipeline["name"]
-            )
-
-        # TODO: treat result to retry errors like in async_streaming_bulk
         task_num = len(self.bulk_tasks)
 
         if self._logger.isEnabledFor(logging.DEBUG):
+            ops_num = sum(len(docs) for docs in stats.values())
             self._logger.debug(
-                f"Task {task_num} - Sending a batch of {len(operations)} ops -- {get_mib_size(operations)}MiB"
+                f"Task {task_num} - Sending a batch of {ops_num} ops -- {round(len(operations) / (1024 * 1024), 2)}MiB"
             )
 
-        # TODO: retry 429s for individual items here
-        res = await self.client.bulk_insert(operations, self.pipeline["name"])
-        ids_to_ops = self._map_id_to_op(operations)
+        res = await self._bulk_insert_with_item_retries(operations)
+        ids_to_ops = self._map_id_to_op(stats)
         await self._process_bulk_response(
             res, ids_to_ops, do_log=self._enable_bulk_operations_logging
         )
@@ -207,22 +318,89 @@ class Sink:
 
         return res
 
-    def _map_id_to_op(self, operations):
+    async def _bulk_insert_with_item_retries(self, operations):
+        """Sends a bulk request, then sends again the items rejected with a transient error.
+
+        Only the rejected operations are part of the next request, which is delayed with a
+        jittered linear backoff. Those requests are not retried by the client: a transient
+        failure counts as one of the `max_retries` attempts, so delays do not compound.
+        Returns a response holding the final outcome of every operation, in the order they
+        were sent.
+        """
+        res = await self.client.bulk_insert(operations, self.pipeline["name"])
+        items = res.get("items", [])
+        # positions in `items` of the operations sent by the last request
+        positions = range(len(items))
+        retry = 0
+
+        while retry < self.max_retires and not self._canceled:
+            rejected = [
+                position
+                for position in positions
+                if _item_status(items[position]) in RETRYABLE_ITEM_STATUSES
+            ]
+            if not rejected:
+                break
+
+            if retry == 0:
+                payloads = _split_payload(operations, items)
+                if payloads is None:
+                    # the response can't be matched to the request
+                    break
+                items = list(items)
+                res = {"took": res.get("took"), "items": items}
+
+            retry += 1
+            self._logger.warning(
+                f"Elasticsearch rejected {len(rejected)} bulk items, retrying them ({retry} of {self.max_retires})"
+            )
+            await self._sleep_before_item_retry(retry)
+            if self._canceled:
+                break
+
+            positions = rejected
+            try:
+                retry_res = await self.client.bulk_insert(
+                    b"".join(payloads[position] for position in rejected),
+                    self.pipeline["name"],
+                    with_retries=False,
+                )
+            except (ApiError, ConnectionTimeout) as e:
+                if (
+                    isinstance(e, ApiError)
+                    and e.status_code not in RETRYABLE_ITEM_STATUSES
+                ):
+                    raise
+                # the items are still rejected, they are sent with the next attempt
+                self._logger.warning(f"Retrying rejected bulk items failed: {e}")
+                continue
+            for position, item in zip(rejected, retry_res["items"], strict=True):
+                items[position] = item
+
+        if retry > 0:
+            res["errors"] = any(
+                "error" in data for item in items for data in item.values()
+            )
+        return res
+
+    async def _sleep_before_item_retry(self, retry):
+        time_to_sleep = min(
+            time_to_sleep_between_retries(
+                RetryStrategy.LINEAR_BACKOFF, self.retry_interval, retry
+            ),
+            MAX_ITEM_RETRY_BACKOFF,
+        )
+        # jitter, so the batches rejected together are not sent again together
+        time_to_sleep += random.uniform(0, self.retry_interval)  # noqa S311
+        self._logger.debug(f"Attempt {retry}: sleeping for {time_to_sleep}")
+        await self._sleeps.sleep(time_to_sleep)
+
+    def _map_id_to_op(self, stats):
         """
-        Takes operations like: [{operation: {"_index": index, "_id": doc_id}}, doc["doc"]]
+        Takes stats like: {operation: {doc_id: doc_size}}
         and turns them into { doc_id : operation }
         """
-        result = {}
-        for entry in operations:
-            if len(entry.keys()) == 1:  # only looking at "operation" entries
-                for op, doc in entry.items():
-                    if (
-                        isinstance(doc, dict)
-                        and "_id" in doc.keys()
-                        and "_index" in doc.keys()
-                    ):  # avoiding update bulk extra entries
-                        result[doc["_id"]] = op
-        return result
+        return {doc_id: op for op, docs in stats.items() for doc_id in docs}
 
     async def _process_bulk_response(self, res, ids_to_ops, do_log=False):
         for item in res.get("items", []):
@@ -310,18 +488,28 @@ class Sink:
         )
         self.counters.increment(DELETED_DOCUMENT_COUNT, len(stats[OP_DELETE]))
 
+        if not self._logger.isEnabledFor(logging.DEBUG):
+            return
+        # batches complete concurrently, there is no point logging totals for each of them
+        now = time.monotonic()
+        if now - self._stats_logged_at < STATS_LOG_INTERVAL:
+            return
+        self._stats_logged_at = now
         self._logger.debug(
             f"Sink stats - no. of docs indexed: {self.counters.get(INDEXED_DOCUMENT_COUNT)}, volume of docs indexed: {round(self.counters.get(INDEXED_DOCUMENT_VOLUME))} bytes, no. of docs deleted: {self.counters.get(DELETED_DOCUMENT_COUNT)}"
         )
 
     def force_cancel(self):
         self._canceled = True
+        self._sleeps.cancel()
 
-    async def fetch_doc(self):
+    async def fetch_doc(self, timeout=None):
         if self._canceled:
             raise ForceCanceledError
 
-        return await self.queue.get()
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
 
     async def run(self):
         try:
@@ -345,67 +533,96 @@ class Sink:
         An item is a (size, object) tuple. Exits when the
         item is the `END_DOCS` or `EXTRACTOR_ERROR` string.
 
-        Bulk calls are executed concurrently with a maximum number of concurrent
-        requests.
+        Bulk calls, including the last one, are executed concurrently with a
+        maximum number of concurrent requests.
         """
         try:
-            batch = []
+            # operations are serialized as they come in, so the payload is ready to be sent
+            buffer = io.BytesIO()
+            lines_num = 0
             # stats is a dictionary containing stats for 3 operations. In each sub-dictionary, it is a doc id to size map.
             stats = {OP_INDEX: {}, OP_UPDATE: {}, OP_DELETE: {}}
-            bulk_size = 0
             overhead_size = None
             batch_num = 0
+            batch_started = time.monotonic()
 
             while True:
                 batch_num += 1
-                doc_size, doc = await self.fetch_doc()
+                timeout = None
+                if lines_num > 0 and self.queue.empty():
+                    # do not hold a pending batch back while waiting for the next doc
+                    timeout = max(
+                        self.chunk_flush_interval - (time.monotonic() - batch_started),
+                        0,
+                    )
+                try:
+                    doc_size, doc = await self.fetch_doc(timeout)
+                except asyncio.TimeoutError:
+                    # the pending batch is too old, it gets flushed below
+                    doc = None
+
                 if doc in (END_DOCS, EXTRACTOR_ERROR):
                     break
-                operation = doc["_op_type"]
-                doc_id = doc["_id"]
-                if not doc_id:
-                    self._logger.warning(f"Skip document {doc} as '_id' is missing.")
-                    continue
-                if operation == OP_DELETE:
-                    stats[operation][doc_id] = 0
-                else:
-                    # the doc_size also includes _op_type, _index and _id,
-                    # which we want to exclude when calculating the size.
-                    if overhead_size is None:
-                        overhead = {
-                            "_op_type": operation,
-                            "_index": doc["_index"],
-                            "_id": doc_id,
-                        }
-                        overhead_size = get_size(overhead)
-                    stats[operation][doc_id] = max(doc_size - overhead_size, 0)
-                self.counters.increment(operation, namespace=BULK_OPERATIONS)
-                batch.extend(self._bulk_op(doc, operation))
-
-                bulk_size += doc_size
-                if len(batch) >= self.chunk_size or bulk_size > self.chunk_mem_size:
-                    await self.bulk_tasks.put(
-                        functools.partial(
-                            self._batch_bulk,
-                            copy.copy(batch),
-                            copy.copy(stats),
-                        ),
-                        name=f"Elasticsearch Sink: _bulk batch #{batch_num}",
-                    )
-                    batch.clear()
+                if doc is not None:
+                    operation = doc["_op_type"]
+                    doc_id = doc["_id"]
+                    if not doc_id:
+                        self._logger.warning(
+                            f"Skip document {doc} as '_id' is missing."
+                        )
+                        continue
+                    if operation == OP_DELETE:
+                        stats[operation][doc_id] = 0
+                    else:
+                        # the doc_size also includes _op_type, _index and _id,
+                        # which we want to exclude when calculating the size.
+                        if overhead_size is None:
+                            overhead = {
+                                "_op_type": operation,
+                                "_index": doc["_index"],
+                                "_id": doc_id,
+                            }
+                            overhead_size = get_size(overhead)
+                        stats[operation][doc_id] = max(doc_size - overhead_size, 0)
+                    self.counters.increment(operation, namespace=BULK_OPERATIONS)
+                    if lines_num == 0:
+                        batch_started = time.monotonic()
+                    self._write_bulk_op(buffer, doc, operation)
+                    # deletes are a single line, other operations carry the document
+                    lines_num += 1 if operation == OP_DELETE else 2
+
+                if lines_num > 0 and (
+                    doc is None
+                    or lines_num >= self.chunk_size
+                    or buffer.tell() >= self.chunk_mem_size
+                    or time.monotonic() - batch_started >= self.chunk_flush_interval
+                ):
+                    # the batch task owns the payload and stats, the next batch starts
+                    # with new ones so neither needs to be copied
+                    await self._flush(buffer.getvalue(), stats, batch_num)
+                    buffer = io.BytesIO()
+                    lines_num = 0
                     stats = {OP_INDEX: {}, OP_UPDATE: {}, OP_DELETE: {}}
-                    bulk_size = 0
 
-                await asyncio.sleep(0)
+                if batch_num % YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
                 self.bulk_tasks.raise_any_exception()
 
+            # the last batch goes through the pool as well, so it does not wait
+            # for the batches still in flight to complete
+            if lines_num > 0:
+                await self._flush(buffer.getvalue(), stats, batch_num)
             await self.bulk_tasks.join(raise_on_error=True)
-            if len(batch) > 0:
-                await self._batch_bulk(batch, stats)
         except Exception as e:
             self.error = e
             raise
 
+    async def _flush(self, operations, stats, batch_num):
+        await self.bulk_tasks.put(
+            functools.partial(self._batch_bulk, operations, stats),
+            name=f"Elasticsearch Sink: _bulk batch #{batch_num}",
+        )
+
 
 class Extractor:
     """Grabs data and adds them in the queue for the bulker.
@@ -539,7 +756,17 @@ class Extractor:
            skip_unchanged_documents (bool): if True, will skip documents that have not changed since last sync
         """
         generator = self._decorate_with_metrics_span(generator)
-        existing_ids = await self._load_existing_docs()
+        existing_ids = None
+        scan = None
+        # ids of the documents queued while the index is still being scanned
+        pending_ids = []
+        if skip_unchanged_documents:
+            # each document needs its indexed timestamp before it is queued
+            existing_ids = await self._load_existing_docs()
+        else:
+            # existing ids only matter for counters and deletions, documents are
+            # queued while they are collected
+            scan = asyncio.create_task(self._load_existing_docs(with_timestamps=False))
 
         self._logger.info("Iterating on remote documents")
         lazy_downloads = ConcurrentTasks(self.concurrent_downloads)
@@ -550,6 +777,8 @@ class Extractor:
                 doc, lazy_download, operation = doc
                 if count % self.display_every == 0:
                     self._log_progress()
+                if count % YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
 
                 doc_id = doc.pop("_id")
                 doc["id"] = doc_id
@@ -560,33 +789,39 @@ class Extractor:
                     self.counters.increment((DOCS_FILTERED))
                     continue
 
-                if doc_id in existing_ids:
+                # new documents get a timestamp, so wait to know if it is one
+                if existing_ids is None and (scan.done() or TIMESTAMP_FIELD not in doc):
+                    existing_ids = self._count_pending_ids(await scan, pending_ids)
+
+                if existing_ids is None:
+                    pending_ids.append(doc_id)
+                else:
                     # pop out of existing_ids, so they do not get deleted
-                    ts = existing_ids.pop(doc_id)
-
-                    if (
-                        skip_unchanged_documents
-                        and TIMESTAMP_FIELD in doc
-                        and ts == doc[TIMESTAMP_FIELD]
-                    ):
-                        # cancel the download
+                    ts = existing_ids.pop(doc_id, NOT_INDEXED)
+                    if ts is not NOT_INDEXED:
                         if (
-                            self.content_extraction_enabled
-                            and lazy_download is not None
+                            skip_unchanged_documents
+                            and TIMESTAMP_FIELD in doc
+                            and ts == timestamp_key(doc[TIMESTAMP_FIELD])
                         ):
-                            await lazy_download(doit=False)
+                            # cancel the download
+                            if (
+                                self.content_extraction_enabled
+                                and lazy_download is not None
+                            ):
+                                await lazy_download(doit=False)
 
-                        self._logger.debug(
-                            f"Skipping document with id '{doc_id}' because field '{TIMESTAMP_FIELD}' has not changed since last sync"
-                        )
-                        continue
+                            self._logger.debug(
+                                f"Skipping document with id '{doc_id}' because field '{TIMESTAMP_FIELD}' has not changed since last sync"
+                            )
+                            continue
 
-                    self.counters.increment(UPDATES_QUEUED)
+                        self.counters.increment(UPDATES_QUEUED)
 
-                else:
-                    self.counters.increment(CREATES_QUEUED)
-                    if TIMESTAMP_FIELD not in doc:
-                        doc[TIMESTAMP_FIELD] = iso_utc()
+                    else:
+                        self.counters.increment(CREATES_QUEUED)
+                        if TIMESTAMP_FIELD not in doc:
+                            doc[TIMESTAMP_FIELD] = iso_utc()
 
                 # if we need to call lazy_download we push it in lazy_downloads
                 if self.content_extraction_enabled and lazy_download is not None:
@@ -612,31 +847,48 @@ class Extractor:
                 # too many errors happened when downloading
                 lazy_downloads.raise_any_exception()
 
-                await asyncio.sleep(0)
-
             # Sit and wait until an error happens
             await lazy_downloads.join(raise_on_error=True)
+
+            if existing_ids is None:
+                existing_ids = self._count_pending_ids(await scan, pending_ids)
         except Exception as ex:
             self._logger.error(f"Extractor failed with an error: {ex}")
             lazy_downloads.cancel()
             raise
         finally:
+            if scan is not None:
+                scan.cancel()
             # wait for all downloads to be finished
             await lazy_downloads.join()
 
         await self.enqueue_docs_to_delete(existing_ids)
         await self.put_doc(END_DOCS)
 
-    async def _load_existing_docs(self):
+    def _count_pending_ids(self, existing_ids, pending_ids):
+        """Counts the documents queued before `existing_ids` was collected.
+
+        Their ids are popped out of `existing_ids`, so they do not get deleted.
+        """
+        for doc_id in pending_ids:
+            if existing_ids.pop(doc_id, NOT_INDEXED) is NOT_INDEXED:
+                self.counters.increment(CREATES_QUEUED)
+            else:
+                self.counters.increment(UPDATES_QUEUED)
+        pending_ids.clear()
+        return existing_ids
+
+    async def _load_existing_docs(self, with_timestamps=True):
         start = time.time()
         self._logger.info("Collecting local document ids")
 
-        existing_ids = {
-            k: v
-            async for (k, v) in self.client.yield_existing_documents_metadata(
-                self.index
-            )
-        }
+        # one comprehension per case, so the per-id branch is not paid
+        # for every document of the index
+        metadata = self.client.yield_existing_documents_metadata(self.index)
+        if with_timestamps:
+            existing_ids = {k: timestamp_key(v) async for (k, v) in metadata}
+        else:
+            existing_ids = {k: None async for (k, _) in metadata}
 
         self._logger.debug(
             f"Found {len(existing_ids)} docs in {self.index} (duration "
@@ -666,6 +918,8 @@ class Extractor:
                 doc, lazy_download, operation = doc
                 if count % self.display_every == 0:
                     self._log_progress()
+                if count % YIELD_EVERY == 0:
+                    await asyncio.sleep(0)
 
                 doc_id = doc.pop("_id")
                 doc["id"] = doc_id
@@ -709,8 +963,6 @@ class Extractor:
                     if operation in (OP_INDEX, OP_UPDATE):
                         item["doc"] = doc
                     await self.put_doc(item)
-
-                await asyncio.sleep(0)
         finally:
             # wait for all downloads to be finished
             await lazy_downloads.join()
@@ -727,27 +979,23 @@ class Extractor:
 
         existing_ids = await self._load_existing_docs()
 
-        if self._logger.isEnabledFor(logging.DEBUG):
-            self._logger.debug(
-                f"Size of {len(existing_ids)} access control document ids  in memory is {get_mib_size(existing_ids)}MiB"
-            )
-
         count = 0
         async for doc in generator:
             doc, _, _ = doc
             count += 1
             if count % self.display_every == 0:
                 self._log_progress()
+            if count % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
 
             doc_id = doc.pop("_id")
             doc["id"] = doc_id
-            doc_exists = doc_id in existing_ids
+            last_update_timestamp = existing_ids.pop(doc_id, NOT_INDEXED)
 
-            if doc_exists:
-                last_update_timestamp = existing_ids.pop(doc_id)
+            if last_update_timestamp is not NOT_INDEXED:
                 doc_not_updated = (
                     TIMESTAMP_FIELD in doc
-                    and last_update_timestamp == doc[TIMESTAMP_FIELD]
+                    and last_update_timestamp == timestamp_key(doc[TIMESTAMP_FIELD])
                 )
 
                 if doc_not_updated:
@@ -772,14 +1020,19 @@ class Extractor:
                     "doc": doc,
                 }
             )
-            await asyncio.sleep(0)
 
         await self.enqueue_docs_to_delete(existing_ids)
         await self.put_doc(END_DOCS)
 
     async def enqueue_docs_to_delete(self, existing_ids):
+        """Queues a delete operation for each id left in `existing_ids`.
+
+        Ids are popped as they are queued, so `existing_ids` does not hold them
+        for the rest of the sync.
+        """
         self._logger.debug(f"Delete {len(existing_ids)} docs from index '{self.index}'")
-        for doc_id in existing_ids.keys():
+        while existing_ids:
+            doc_id, _ = existing_ids.popitem()
             await self.put_doc(
                 {
                     "_op_type": OP_DELETE,
@@ -830,8 +1083,10 @@ class SyncOrchestrator:
         self._sink_task = None
         self.error = None
         self.canceled = False
+        self._index_settings_to_restore = None
 
     async def close(self):
+        await self._restore_index_settings()
         await self.es_management_client.close()
         await self.cancel()
 
@@ -843,7 +1098,11 @@ class SyncOrchestrator:
         return None
 
     async def prepare_content_index(self, index_name, language_code=None):
-        """Creates the index, given a mapping/settings if it does not exist."""
+        """Creates the index, given a mapping/settings if it does not exist.
+
+        Returns `True` if the index is empty, e.g. when it was just created or
+        created along with the connector, so the sync is its initial load.
+        """
         self._logger.debug(f"Checking index {index_name}")
 
         index = await self.es_management_client.get_index_or_alias(
@@ -853,13 +1112,85 @@ class SyncOrchestrator:
         if index:
             # Update the index mappings if needed
             self._logger.debug(f"{index_name} exists")
-        else:
-            # Create a new index
-            self._logger.info(f"Creating content index: {index_name}")
-            await self.es_management_client.create_content_index(
-                index_name, language_code
+            return await self.es_management_client.count_documents(index_name) == 0
+
+        # Create a new index
+        self._logger.info(f"Creating content index: {index_name}")
+        await self.es_management_client.create_content_index(index_name, language_code)
+        self._logger.info(f"Content index successfully created:  {index_name}")
+        return True
+
+    async def _tune_index_for_initial_load(self, index):
+        if self.es_management_client.serverless:
+            # refresh and replicas are managed by Elasticsearch on serverless
+            return
+
+        try:
+            original_settings = await self.es_management_client.get_index_settings(
+                index, list(INITIAL_LOAD_INDEX_SETTINGS)
             )
-            self._logger.info(f"Content index successfully created:  {index_name}")
+            # also kept in the index, so the next sync restores them if this one
+            # does not get to it, e.g. when the process is killed
+            await self._save_settings_to_restore(index, original_settings)
+            await self.es_management_client.update_index_settings(
+                index, INITIAL_LOAD_INDEX_SETTINGS
+            )
+        except Exception as e:
+            self._logger.warning(
+                f"Could not tune index {index} for the initial load, syncing with its current settings: {e}"
+            )
+            return
+
+        self._logger.debug(
+            f"Disabled refresh and replicas of {index} for the initial load"
+        )
+        self._index_settings_to_restore = (index, original_settings)
+
+    async def _restore_index_settings(self):
+        if self._index_settings_to_restore is None:
+            return
+
+        index, settings = self._index_settings_to_restore
+        self._index_settings_to_restore = None
+        try:
+            await self.es_management_client.update_index_settings(index, settings)
+            await self._save_settings_to_restore(index, None)
+            self._logger.debug(f"Restored settings {settings} of {index}")
+        except Exception as e:
+            self._logger.error(
+                f"Could not restore settings {settings} of {index}, the next sync will try again: {e}"
+            )
+
+    async def _restore_interrupted_initial_load_settings(self, index):
+        """Restores the settings left on `index` by an initial load that did not complete."""
+        if self.es_management_client.serverless:
+            return
+
+        try:
+            meta = await self.es_management_client.get_index_meta(index)
+        except Exception as e:
+            self._logger.warning(f"Could not read the mapping metadata of {index}: {e}")
+            return
+
+        settings = meta.get(SETTINGS_TO_RESTORE_META_KEY)
+        if settings is None:
+            return
+
+        self._logger.warning(
+            f"The initial load of {index} did not restore its settings, restoring them"
+        )
+        self._index_settings_to_restore = (index, settings)
+        await self._restore_index_settings()
+
+    async def _save_settings_to_restore(self, index, settings):
+        """Stores `settings` in the `_meta` of `index`, `None` removes them."""
+        # `_meta` is replaced as a whole, other entries are sent back as they are
+        meta = await self.es_management_client.get_index_meta(index)
+        if settings is None:
+            meta.pop(SETTINGS_TO_RESTORE_META_KEY, None)
+        else:
+            meta[SETTINGS_TO_RESTORE_META_KEY] = settings
+        await self.es_management_client.update_index_meta(index, meta)
 
     def done(self):
         """
@@ -960,6 +1291,7 @@ class SyncOrchestrator:
         options=None,
         skip_unchanged_documents=False,
         enable_bulk_operations_logging=False,
+        initial_load=False,
     ):
         """Performs a batch of `_bulk` calls, given a generator of documents
 
@@ -972,10 +1304,15 @@ class SyncOrchestrator:
         - sync_rules_enabled: if enabled, applies rules -- default: `False`
         - content_extraction_enabled: if enabled, will download content -- default: `True`
         - options: dict of options (from `elasticsearch.bulk` in the config file)
+        - initial_load: if enabled, refresh and replicas of the index are disabled until the orchestrator is closed, otherwise the settings left by an interrupted initial load are restored -- default: `False`
         """
         if self._extractor_task is not None or self._sink_task is not None:
             msg = "Async bulk task has already started."
             raise AsyncBulkRunningError(msg)
+        if initial_load:
+            await self._tune_index_for_initial_load(index)
+        else:
+            await self._restore_interrupted_initial_load_settings(index)
         if filter_ is None:
             filter_ = Filter()
         if options is None:
@@ -986,6 +1323,9 @@ class SyncOrchestrator:
         chunk_mem_size = options.get("chunk_max_mem_size", DEFAULT_CHUNK_MEM_SIZE)
         max_concurrency = options.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
         chunk_size = options.get("chunk_size", DEFAULT_CHUNK_SIZE)
+        chunk_flush_interval = options.get(
+            "chunk_flush_interval", DEFAULT_CHUNK_FLUSH_INTERVAL
+        )
         concurrent_downloads = options.get(
             "concurrent_downloads", DEFAULT_CONCURRENT_DOWNLOADS
         )
@@ -1036,6 +1376,7 @@ class SyncOrchestrator:
             retry_interval=retry_interval,
             logger_=self._logger,
             enable_bulk_operations_logging=enable_bulk_operations_logging,
+            chunk_flush_interval=chunk_flush_interval,
         )
         self._sink_task = asyncio.create_task(
             self._sink.run(), name=f"Sink for {job_type} sync to {index}"
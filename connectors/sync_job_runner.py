@@ -36,6 +36,8 @@ from connectors.utils import truncate_id
 UTF_8 = "utf-8"
 
 JOB_REPORTING_INTERVAL = 10
+# unchanged ingestion stats are still reported that often, so the job is not seen as idle
+JOB_REPORTING_HEARTBEAT_INTERVAL = 60
 JOB_CHECK_INTERVAL = 1
 ES_ID_SIZE_LIMIT = 512
 
@@ -279,7 +281,7 @@ class SyncJobRunner:
 
         logger.debug("Preparing the content index")
 
-        await self.sync_orchestrator.prepare_content_index(
+        index_empty = await self.sync_orchestrator.prepare_content_index(
             index_name=self.sync_job.index_name, language_code=self.sync_job.language
         )
 
@@ -298,6 +300,7 @@ class SyncJobRunner:
                 job_type, self.data_provider
             ),
             enable_bulk_operations_logging=self._enable_bulk_operations_logging,
+            initial_load=index_empty,
         )
 
     async def _sync_done(self, sync_status, sync_error=None):
@@ -479,6 +482,8 @@ class SyncJobRunner:
                 raise UnsupportedJobType
 
     async def update_ingestion_stats(self, interval):
+        reported_stats = None
+        reported_at = None
         while True:
             await asyncio.sleep(interval)
 
@@ -491,7 +496,15 @@ class SyncJobRunner:
                 INDEXED_DOCUMENT_VOLUME: result.get(INDEXED_DOCUMENT_VOLUME, 0),
                 DELETED_DOCUMENT_COUNT: result.get(DELETED_DOCUMENT_COUNT, 0),
             }
+            if (
+                ingestion_stats == reported_stats
+                and time.monotonic() - reported_at < JOB_REPORTING_HEARTBEAT_INTERVAL
+            ):
+                continue
+
             await self.sync_job.update_metadata(ingestion_stats=ingestion_stats)
+            reported_stats = ingestion_stats
+            reported_at = time.monotonic()
 
     async def check_job(self):
         if not await self.reload_connector():
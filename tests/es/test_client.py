@@ -4,6 +4,7 @@
 # you may not use this file except in compliance with the Elastic License 2.0.
 #
 import base64
+from datetime import datetime
 from functools import cached_property
 from unittest import mock
 from unittest.mock import AsyncMock, Mock
@@ -15,6 +16,8 @@ from connectors import __version__
 from connectors.es.client import (
     ESClient,
     License,
+    OrjsonNdjsonSerializer,
+    OrjsonSerializer,
     RetryInterruptedError,
     TransientElasticsearchRetrier,
     with_concurrency_control,
@@ -256,6 +259,76 @@ class TestESClient:
             == f"elastic-connectors-{__version__}/service"
         )
 
+    @pytest.mark.parametrize(
+        "config, expected_http_compress, expected_connections_per_node",
+        [
+            (BASIC_CONFIG, False, 10),
+            ({**BASIC_CONFIG, "http_compress": True}, True, 10),
+            ({**BASIC_CONFIG, "connections_per_node": 3}, False, 3),
+        ],
+    )
+    def test_es_client_connection_options(
+        self, config, expected_http_compress, expected_connections_per_node
+    ):
+        es_client = ESClient(config)
+        node = es_client.client.transport.node_pool.all()[0]
+
+        assert node.config.http_compress == expected_http_compress
+        assert node.config.connections_per_node == expected_connections_per_node
+
+    def test_uses_orjson_serializers(self):
+        es_client = ESClient(BASIC_CONFIG)
+        serializers = es_client.client.transport.serializers.serializers
+
+        for mimetype in ("application/json", "application/vnd.elasticsearch+json"):
+            assert isinstance(serializers[mimetype], OrjsonSerializer)
+        for mimetype in (
+            "application/x-ndjson",
+            "application/vnd.elasticsearch+x-ndjson",
+        ):
+            assert isinstance(serializers[mimetype], OrjsonNdjsonSerializer)
+
+    @pytest.mark.parametrize(
+        "data, expected",
+        [
+            ({1: "non-string key"}, b'{"1":"non-string key"}'),
+            # orjson rejects these, like the json module they are still serialized
+            (
+                {"text": "lone \ud800 surrogate"},
+                b'{"text":"lone \xed\xa0\x80 surrogate"}',
+            ),
+            ({"number": 2**64}, b'{"number":18446744073709551616}'),
+        ],
+    )
+    def test_orjson_serializer_dumps(self, data, expected):
+        assert OrjsonSerializer().dumps(data) == expected
+        assert OrjsonNdjsonSerializer().dumps([data]) == expected + b"\n"
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {"id": "1", "count": 2**63 - 1, "ratio": 0.5, "tags": ["a"]},
+            # orjson reads these back as floats, like the json module they stay ints
+            {"number": 2**64 + 1},
+            {"cursor": {"offset": -123456789012345678901234567890}},
+        ],
+    )
+    def test_orjson_serializer_round_trip(self, data):
+        serializer = OrjsonSerializer()
+
+        assert serializer.loads(serializer.dumps(data)) == data
+        assert OrjsonNdjsonSerializer().loads(serializer.dumps(data)) == [data]
+
+    def test_orjson_ndjson_serializer_forwards_serialized_body(self):
+        serializer = OrjsonNdjsonSerializer()
+        body = b'{"index":{"_id":"1"}}\n{"id":"1"}\n'
+
+        assert serializer.dumps(body) is body
+        assert (
+            serializer.dumps([{"index": {"_id": 1}}, {"date": datetime(2023, 1, 1)}])
+            == b'{"index":{"_id":1}}\n{"date":"2023-01-01T00:00:00"}\n'
+        )
+
 
 class TestTransientElasticsearchRetrier:
     @cached_property
@@ -6,7 +6,7 @@
 from unittest.mock import AsyncMock, Mock
 
 import pytest
-from elasticsearch import ApiError, ConflictError
+from elasticsearch import ApiError, ConflictError, NotFoundError
 
 from connectors.es.index import DocumentNotFoundError, ESIndex
 
@@ -19,15 +19,27 @@ config = {
 index_name = "fake_index"
 
 
-@pytest.mark.asyncio
-async def test_es_index_create_object_error(mock_responses):
-    index = ESIndex(index_name, config)
+def mock_point_in_time(mock_responses):
     mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_refresh", headers=headers, status=200
+        f"http://nowhere.com:9200/{index_name}/_pit?expand_wildcards=hidden&keep_alive=1m",
+        headers=headers,
+        status=200,
+        payload={"id": "pit-1"},
     )
+    mock_responses.delete(
+        "http://nowhere.com:9200/_pit",
+        headers=headers,
+        status=200,
+        payload={"succeeded": True, "num_freed": 1},
+    )
+
 
+@pytest.mark.asyncio
+async def test_es_index_create_object_error(mock_responses):
+    index = ESIndex(index_name, config)
+    mock_point_in_time(mock_responses)
     mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_search?expand_wildcards=hidden",
+        "http://nowhere.com:9200/_search",
         headers=headers,
         status=200,
         payload={"hits": {"total": {"value": 1}, "hits": [{"_id": 1}]}},
@@ -52,10 +64,6 @@ class FakeIndex(ESIndex):
 async def test_fetch_by_id(mock_responses):
     doc_id = "1"
     index = FakeIndex(index_name, config)
-    mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_refresh", headers=headers, status=200
-    )
-
     mock_responses.get(
         f"http://nowhere.com:9200/{index_name}/_doc/{doc_id}",
         headers=headers,
@@ -80,10 +88,6 @@ async def test_fetch_response_by_id(mock_responses):
         "_primary_term": 1,
         "_source": {},
     }
-    mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_refresh", headers=headers, status=200
-    )
-
     mock_responses.get(
         f"http://nowhere.com:9200/{index_name}/_doc/{doc_id}",
         headers=headers,
@@ -101,10 +105,6 @@ async def test_fetch_response_by_id(mock_responses):
 async def test_fetch_response_by_id_not_found(mock_responses):
     doc_id = "1"
     index = FakeIndex(index_name, config)
-    mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_refresh", headers=headers, status=200
-    )
-
     mock_responses.get(
         f"http://nowhere.com:9200/{index_name}/_doc/{doc_id}",
         headers=headers,
@@ -121,10 +121,6 @@ async def test_fetch_response_by_id_not_found(mock_responses):
 async def test_fetch_response_by_id_api_error(mock_responses, patch_sleep):
     doc_id = "1"
     index = FakeIndex(index_name, config)
-    mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_refresh", headers=headers, status=200
-    )
-
     mock_responses.get(
         f"http://nowhere.com:9200/{index_name}/_doc/{doc_id}",
         headers=headers,
@@ -204,12 +200,9 @@ async def test_update_by_script():
 @pytest.mark.asyncio
 async def test_get_all_docs_with_error(mock_responses, patch_logger, patch_sleep):
     index = FakeIndex(index_name, config)
+    mock_point_in_time(mock_responses)
     mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_refresh", headers=headers, status=200
-    )
-
-    mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_search?expand_wildcards=hidden",
+        "http://nowhere.com:9200/_search",
         headers=headers,
         status=500,
         repeat=True,
@@ -229,23 +222,27 @@ async def test_get_all_docs_with_error(mock_responses, patch_logger, patch_sleep
 async def test_get_all_docs(mock_responses):
     index = FakeIndex(index_name, config)
     total = 3
+    mock_point_in_time(mock_responses)
     mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_refresh", headers=headers, status=200
-    )
-
-    mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_search?expand_wildcards=hidden",
+        "http://nowhere.com:9200/_search",
         headers=headers,
         status=200,
         payload={
-            "hits": {"total": {"value": total}, "hits": [{"_id": "1"}, {"_id": "2"}]}
+            "pit_id": "pit-1",
+            "hits": {
+                "total": {"value": total},
+                "hits": [{"_id": "1", "sort": [1]}, {"_id": "2", "sort": [2]}],
+            },
         },
     )
     mock_responses.post(
-        f"http://nowhere.com:9200/{index_name}/_search?expand_wildcards=hidden",
+        "http://nowhere.com:9200/_search",
         headers=headers,
         status=200,
-        payload={"hits": {"total": {"value": total}, "hits": [{"_id": "3"}]}},
+        payload={
+            "pit_id": "pit-1",
+            "hits": {"total": {"value": total}, "hits": [{"_id": "3", "sort": [3]}]},
+        },
     )
 
     doc_count = 0
@@ -255,3 +252,70 @@ async def test_get_all_docs(mock_responses):
     assert doc_count == total
 
     await index.close()
+
+
+@pytest.mark.asyncio
+async def test_get_all_docs_pages_with_search_after():
+    index = FakeIndex(index_name, config)
+    index.client = Mock()
+    index.client.open_point_in_time = AsyncMock(return_value={"id": "pit-1"})
+    index.client.close_point_in_time = AsyncMock()
+    index.client.search = AsyncMock(
+        side_effect=[
+            {
+                "pit_id": "pit-2",
+                "hits": {
+                    "hits": [{"_id": "1", "sort": [1]}, {"_id": "2", "sort": [2]}]
+                },
+            },
+            {"pit_id": "pit-2", "hits": {"hits": []}},
+        ]
+    )
+
+    docs = [
+        doc
+        async for doc in index.get_all_docs(sort=[{"created_at": "asc"}], page_size=2)
+    ]
+
+    assert len(docs) == 2
+    first_call, second_call = index.client.search.call_args_list
+    assert first_call.kwargs["sort"] == [{"created_at": "asc"}, {"_shard_doc": "asc"}]
+    assert first_call.kwargs["search_after"] is None
+    assert first_call.kwargs["pit"] == {"id": "pit-1", "keep_alive": "1m"}
+    assert second_call.kwargs["search_after"] == [2]
+    assert second_call.kwargs["pit"] == {"id": "pit-2", "keep_alive": "1m"}
+    index.client.close_point_in_time.assert_awaited_once_with(id="pit-2")
+
+
+@pytest.mark.asyncio
+async def test_get_all_docs_reopens_expired_point_in_time():
+    index = FakeIndex(index_name, config)
+    index.client = Mock()
+    index.client.open_point_in_time = AsyncMock(
+        side_effect=[{"id": "pit-1"}, {"id": "pit-3"}]
+    )
+    index.client.close_point_in_time = AsyncMock()
+    error_meta = Mock()
+    error_meta.status = 404
+    index.client.search = AsyncMock(
+        side_effect=[
+            {
+                "pit_id": "pit-2",
+                "hits": {
+                    "hits": [{"_id": "1", "sort": [1]}, {"_id": "2", "sort": [2]}]
+                },
+            },
+            # the consumer spent more than the keep alive on the first page
+            NotFoundError("search_context_missing_exception", error_meta, "error"),
+            {"pit_id": "pit-3", "hits": {"hits": [{"_id": "3", "sort": [3]}]}},
+        ]
+    )
+
+    docs = [doc async for doc in index.get_all_docs(page_size=2)]
+
+    assert len(docs) == 3
+    expired_call, resumed_call = index.client.search.call_args_list[1:]
+    assert expired_call.kwargs["pit"] == {"id": "pit-2", "keep_alive": "1m"}
+    assert resumed_call.kwargs["pit"] == {"id": "pit-3", "keep_alive": "1m"}
+    assert resumed_call.kwargs["search_after"] == [2]
+    index.client.close_point_in_time.assert_awaited_once_with(id="pit-3")
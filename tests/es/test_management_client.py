@@ -4,17 +4,25 @@
 # you may not use this file except in compliance with the Elastic License 2.0.
 #
 from datetime import datetime
-from unittest import mock
 from unittest.mock import ANY, AsyncMock, Mock
 
 import pytest
 import pytest_asyncio
+from elasticsearch import ApiError
 from elasticsearch import (
     NotFoundError as ElasticNotFoundError,
 )
 
-from connectors.es.management_client import ESManagementClient
-from tests.commons import AsyncIterator
+from connectors.es.management_client import (
+    EXISTING_DOCS_PAGE_SIZE,
+    ESManagementClient,
+)
+
+
+def too_many_requests_error():
+    error_meta = Mock()
+    error_meta.status = 429
+    return ApiError(429, meta=error_meta, body="error")
 
 
 class TestESManagementClient:
@@ -150,47 +158,181 @@ class TestESManagementClient:
     ):
         es_management_client.index_exists = AsyncMock(return_value=False)
 
+        ids = []
+        async for (
+            doc_id,
+            _,
+        ) in es_management_client.yield_existing_documents_metadata("something"):
+            ids.append(doc_id)
+
+        assert ids == []
+        es_management_client.client.open_point_in_time.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_yield_existing_documents_metadata_when_index_exists(
+        self, es_management_client, mock_responses
+    ):
+        es_management_client.index_exists = AsyncMock(return_value=True)
+        es_management_client.client.open_point_in_time = AsyncMock(
+            return_value={"id": "pit-1"}
+        )
+
         records = [
-            {"_id": "1", "_source": {"_timestamp": str(datetime.now())}},
-            {"_id": "2", "_source": {"_timestamp": str(datetime.now())}},
+            {"_id": "1", "_source": {"_timestamp": str(datetime.now())}, "sort": [1]},
+            {"_id": "2", "_source": {"_timestamp": str(datetime.now())}, "sort": [2]},
         ]
+        es_management_client.client.search = AsyncMock(
+            return_value={"pit_id": "pit-2", "hits": {"hits": records}}
+        )
 
-        with mock.patch(
-            "connectors.es.management_client.async_scan",
-            return_value=AsyncIterator(records),
-        ):
-            ids = []
-            async for (
-                doc_id,
-                _,
-            ) in es_management_client.yield_existing_documents_metadata("something"):
-                ids.append(doc_id)
+        ids = []
+        async for (
+            doc_id,
+            _,
+        ) in es_management_client.yield_existing_documents_metadata("something"):
+            ids.append(doc_id)
 
-            assert ids == []
+        assert ids == ["1", "2"]
+        es_management_client.client.open_point_in_time.assert_awaited_once_with(
+            index="something", keep_alive="5m"
+        )
+        es_management_client.client.close_point_in_time.assert_awaited_once_with(
+            id="pit-2"
+        )
 
     @pytest.mark.asyncio
-    async def test_yield_existing_documents_metadata_when_index_exists(
+    async def test_yield_existing_documents_metadata_pages_with_search_after(
         self, es_management_client, mock_responses
     ):
         es_management_client.index_exists = AsyncMock(return_value=True)
+        es_management_client.client.open_point_in_time = AsyncMock(
+            return_value={"id": "pit-1"}
+        )
 
-        records = [
-            {"_id": "1", "_source": {"_timestamp": str(datetime.now())}},
-            {"_id": "2", "_source": {"_timestamp": str(datetime.now())}},
+        full_page = [
+            {"_id": str(i), "_source": {"id": f"doc-{i}"}, "sort": [i]}
+            for i in range(EXISTING_DOCS_PAGE_SIZE)
         ]
+        last_page = [{"_id": "last", "_source": {}, "sort": [EXISTING_DOCS_PAGE_SIZE]}]
+        es_management_client.client.search = AsyncMock(
+            side_effect=[
+                {"pit_id": "pit-1", "hits": {"hits": full_page}},
+                {"pit_id": "pit-1", "hits": {"hits": last_page}},
+            ]
+        )
 
-        with mock.patch(
-            "connectors.es.management_client.async_scan",
-            return_value=AsyncIterator(records),
-        ):
-            ids = []
+        ids = [
+            doc_id
             async for (
                 doc_id,
                 _,
-            ) in es_management_client.yield_existing_documents_metadata("something"):
-                ids.append(doc_id)
+            ) in es_management_client.yield_existing_documents_metadata("something")
+        ]
+
+        assert len(ids) == EXISTING_DOCS_PAGE_SIZE + 1
+        assert ids[0] == "doc-0"
+        assert ids[-1] == "last"
 
-            assert ids == ["1", "2"]
+        first_call, second_call = es_management_client.client.search.call_args_list
+        assert first_call.kwargs["search_after"] is None
+        assert first_call.kwargs["sort"] == [{"_shard_doc": "asc"}]
+        assert second_call.kwargs["search_after"] == [EXISTING_DOCS_PAGE_SIZE - 1]
+        es_management_client.client.close_point_in_time.assert_awaited_once_with(
+            id="pit-1"
+        )
+
+    @pytest.mark.asyncio
+    async def test_count_documents(self, es_management_client):
+        es_management_client.client.count = AsyncMock(return_value={"count": 3})
+
+        assert await es_management_client.count_documents("search-mongo") == 3
+        es_management_client.client.count.assert_awaited_with(index="search-mongo")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("index_name", ["search-mongo", "search-mongo-alias"])
+    async def test_get_index_settings(self, es_management_client, index_name):
+        # the response is keyed by the index an alias points to
+        es_management_client.client.indices.get_settings = AsyncMock(
+            return_value={
+                "search-mongo": {"settings": {"index.refresh_interval": "5s"}},
+            }
+        )
+
+        settings = await es_management_client.get_index_settings(
+            index_name, ["index.refresh_interval", "index.number_of_replicas"]
+        )
+
+        assert settings == {
+            "index.refresh_interval": "5s",
+            "index.number_of_replicas": None,
+        }
+        es_management_client.client.indices.get_settings.assert_awaited_with(
+            index=index_name,
+            name=["index.refresh_interval", "index.number_of_replicas"],
+            flat_settings=True,
+        )
+
+    @pytest.mark.asyncio
+    async def test_update_index_settings(self, es_management_client):
+        index_name = "search-mongo"
+        settings = {"index.refresh_interval": None}
+
+        await es_management_client.update_index_settings(index_name, settings)
+
+        es_management_client.client.indices.put_settings.assert_awaited_with(
+            index=index_name, settings=settings
+        )
+
+    @pytest.mark.parametrize(
+        "mappings, expected_meta",
+        [
+            ({"_meta": {"owner": "someone"}}, {"owner": "someone"}),
+            ({}, {}),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_get_index_meta(self, es_management_client, mappings, expected_meta):
+        # the response is keyed by the index an alias points to
+        es_management_client.client.indices.get_mapping = AsyncMock(
+            return_value={"search-mongo-v2": {"mappings": mappings}}
+        )
+
+        assert await es_management_client.get_index_meta("search-mongo") == (
+            expected_meta
+        )
+
+    @pytest.mark.asyncio
+    async def test_update_index_meta(self, es_management_client):
+        await es_management_client.update_index_meta("search-mongo", {"a": "b"})
+
+        es_management_client.client.indices.put_mapping.assert_awaited_with(
+            index="search-mongo", meta={"a": "b"}
+        )
+
+    @pytest.mark.asyncio
+    async def test_bulk_insert_retries_transient_errors(
+        self, es_management_client, patch_sleep
+    ):
+        es_management_client.client.bulk = AsyncMock(
+            side_effect=[too_many_requests_error(), {"items": []}]
+        )
+
+        assert await es_management_client.bulk_insert(b"{}\n", "pipeline") == {
+            "items": []
+        }
+        assert es_management_client.client.bulk.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_bulk_insert_without_retries(self, es_management_client):
+        es_management_client.client.bulk = AsyncMock(
+            side_effect=[too_many_requests_error(), {"items": []}]
+        )
+
+        with pytest.raises(ApiError):
+            await es_management_client.bulk_insert(
+                b"{}\n", "pipeline", with_retries=False
+            )
+        assert es_management_client.client.bulk.await_count == 1
 
     @pytest.mark.asyncio
     async def test_get_connector_secret(self, es_management_client, mock_responses):
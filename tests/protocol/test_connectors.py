@@ -269,10 +269,13 @@ async def test_supported_connectors(
 
     headers = {"X-Elastic-Product": "Elasticsearch"}
     mock_responses.post(
-        "http://nowhere.com:9200/.elastic-connectors/_refresh", headers=headers
+        "http://nowhere.com:9200/.elastic-connectors/_pit?expand_wildcards=hidden&keep_alive=1m",
+        payload={"id": "pit-1"},
+        headers=headers,
     )
+    mock_responses.delete("http://nowhere.com:9200/_pit", headers=headers)
     mock_responses.post(
-        "http://nowhere.com:9200/.elastic-connectors/_search?expand_wildcards=hidden",
+        "http://nowhere.com:9200/_search",
         body={"query": query},
         payload={
             "hits": {"hits": [{"_id": "1", "_source": mongo}], "total": {"value": 1}}
@@ -299,11 +302,13 @@ async def test_all_connectors(mock_responses):
     config = {"host": "http://nowhere.com:9200", "user": "tarek", "password": "blah"}
     headers = {"X-Elastic-Product": "Elasticsearch"}
     mock_responses.post(
-        "http://nowhere.com:9200/.elastic-connectors/_refresh", headers=headers
+        "http://nowhere.com:9200/.elastic-connectors/_pit?expand_wildcards=hidden&keep_alive=1m",
+        payload={"id": "pit-1"},
+        headers=headers,
     )
-
+    mock_responses.delete("http://nowhere.com:9200/_pit", headers=headers)
     mock_responses.post(
-        "http://nowhere.com:9200/.elastic-connectors/_search?expand_wildcards=hidden",
+        "http://nowhere.com:9200/_search",
         payload={
             "hits": {"hits": [{"_id": "1", "_source": mongo}], "total": {"value": 1}}
         },
@@ -2456,7 +2461,8 @@ async def test_get_connector_by_index():
     es_client = ConnectorIndex(config)
     es_client.client = Mock()
 
-    es_client.client.indices.refresh = AsyncMock()
+    es_client.client.open_point_in_time = AsyncMock(return_value={"id": "pit-1"})
+    es_client.client.close_point_in_time = AsyncMock()
     es_client.client.search = AsyncMock(
         return_value={"hits": {"total": {"value": 1}, "hits": [doc]}}
     )
@@ -5,6 +5,7 @@
 #
 import asyncio
 import datetime
+import io
 import itertools
 import json
 from copy import deepcopy
@@ -22,10 +23,12 @@ from connectors.es.sink import (
     CREATES_QUEUED,
     DELETES_QUEUED,
     DOCS_EXTRACTED,
+    INITIAL_LOAD_INDEX_SETTINGS,
     OP_DELETE,
     OP_INDEX,
     OP_UPDATE,
     RESULT_SUCCESS,
+    SETTINGS_TO_RESTORE_META_KEY,
     UPDATES_QUEUED,
     AsyncBulkRunningError,
     ElasticsearchOverloadedError,
@@ -33,6 +36,7 @@ from connectors.es.sink import (
     ForceCanceledError,
     Sink,
     SyncOrchestrator,
+    timestamp_key,
 )
 from connectors.protocol import JobType, Pipeline
 from connectors.protocol.connectors import (
@@ -171,16 +175,17 @@ async def test_prepare_content_index_create_index(
         "create_content_index",
         return_value=create_index_result,
     ) as create_index_mock:
-        await es.prepare_content_index(index_name, language_code)
+        assert await es.prepare_content_index(index_name, language_code)
 
         await es.close()
 
         create_index_mock.assert_called_with(index_name, language_code)
 
 
+@pytest.mark.parametrize("doc_count, index_empty", [(0, True), (5, False)])
 @patch("connectors.es.sink.CANCELATION_TIMEOUT", -1)
 @pytest.mark.asyncio
-async def test_prepare_content_index(mock_responses):
+async def test_prepare_content_index(mock_responses, doc_count, index_empty):
     language_code = "en"
     config = {"host": "http://nowhere.com:9200", "user": "tarek", "password": "blah"}
     headers = {"X-Elastic-Product": "Elasticsearch"}
@@ -202,17 +207,150 @@ async def test_prepare_content_index(mock_responses):
     es = SyncOrchestrator(config)
     es._sink = Mock()
     es._extractor = Mock()
+    es.es_management_client.count_documents = AsyncMock(return_value=doc_count)
     with mock.patch.object(
         es.es_management_client,
         "create_content_index",
     ) as create_index_mock:
-        await es.prepare_content_index(index_name, language_code)
+        # an index created along with the connector is empty on its first sync
+        assert await es.prepare_content_index(index_name, language_code) == index_empty
 
         await es.close()
 
         create_index_mock.assert_not_called()
 
 
+def orchestrator_with_index_settings(settings, meta=None):
+    """A `SyncOrchestrator` on an index with `settings` and `_meta`, syncing no docs."""
+    config = {"host": "http://nowhere.com:9200", "user": "tarek", "password": "blah"}
+    es = SyncOrchestrator(config)
+    client = es.es_management_client
+    client.get_index_settings = AsyncMock(return_value=settings)
+    client.update_index_settings = AsyncMock()
+    # a new dict every time, like a response would be
+    client.get_index_meta = AsyncMock(side_effect=lambda index: dict(meta or {}))
+    client.update_index_meta = AsyncMock()
+    client.yield_existing_documents_metadata = Mock(return_value=AsyncIterator([]))
+    return es
+
+
+async def sync_no_docs(es, initial_load):
+    await es.async_bulk(
+        "search-new-index",
+        AsyncIterator([]),
+        Pipeline({}),
+        JobType.FULL,
+        initial_load=initial_load,
+    )
+    while not es.done():
+        await asyncio.sleep(0.01)
+    await es.close()
+
+
+@pytest.mark.parametrize(
+    "serverless, expected_updates, expected_meta_updates",
+    [
+        (
+            False,
+            [
+                call("search-new-index", INITIAL_LOAD_INDEX_SETTINGS),
+                call(
+                    "search-new-index",
+                    {"index.refresh_interval": "5s", "index.number_of_replicas": None},
+                ),
+            ],
+            [
+                call(
+                    "search-new-index",
+                    {
+                        "owner": "someone",
+                        SETTINGS_TO_RESTORE_META_KEY: {
+                            "index.refresh_interval": "5s",
+                            "index.number_of_replicas": None,
+                        },
+                    },
+                ),
+                call("search-new-index", {"owner": "someone"}),
+            ],
+        ),
+        (True, [], []),
+    ],
+)
+@patch("connectors.es.sink.CANCELATION_TIMEOUT", -1)
+@pytest.mark.asyncio
+async def test_initial_load_tunes_index_until_closed(
+    serverless, expected_updates, expected_meta_updates
+):
+    es = orchestrator_with_index_settings(
+        {"index.refresh_interval": "5s", "index.number_of_replicas": None},
+        meta={"owner": "someone"},
+    )
+    es.es_management_client.serverless = serverless
+
+    await sync_no_docs(es, initial_load=True)
+
+    assert es.es_management_client.update_index_settings.call_args_list == (
+        expected_updates
+    )
+    # the settings to restore are kept in the index until they are restored
+    assert es.es_management_client.update_index_meta.call_args_list == (
+        expected_meta_updates
+    )
+
+
+@patch("connectors.es.sink.CANCELATION_TIMEOUT", -1)
+@pytest.mark.asyncio
+async def test_sync_restores_settings_left_by_interrupted_initial_load():
+    settings = {"index.refresh_interval": None, "index.number_of_replicas": "1"}
+    es = orchestrator_with_index_settings(
+        INITIAL_LOAD_INDEX_SETTINGS, meta={SETTINGS_TO_RESTORE_META_KEY: settings}
+    )
+
+    await sync_no_docs(es, initial_load=False)
+
+    es.es_management_client.update_index_settings.assert_awaited_once_with(
+        "search-new-index", settings
+    )
+    es.es_management_client.update_index_meta.assert_awaited_once_with(
+        "search-new-index", {}
+    )
+
+
+@patch("connectors.es.sink.CANCELATION_TIMEOUT", -1)
+@pytest.mark.asyncio
+async def test_sync_leaves_settings_of_loaded_index_alone():
+    es = orchestrator_with_index_settings(
+        {"index.refresh_interval": None, "index.number_of_replicas": None}
+    )
+
+    await sync_no_docs(es, initial_load=False)
+
+    es.es_management_client.update_index_settings.assert_not_awaited()
+    es.es_management_client.update_index_meta.assert_not_awaited()
+
+
+@patch("connectors.es.sink.CANCELATION_TIMEOUT", -1)
+@pytest.mark.asyncio
+async def test_initial_load_does_not_fail_when_settings_cannot_be_restored(
+    patch_logger,
+):
+    es = orchestrator_with_index_settings(
+        {"index.refresh_interval": None, "index.number_of_replicas": "1"}
+    )
+    es.es_management_client.update_index_settings.side_effect = [
+        None,
+        Exception("Oops"),
+    ]
+
+    await sync_no_docs(es, initial_load=True)
+
+    patch_logger.assert_present(
+        "Could not restore settings {'index.refresh_interval': None, 'index.number_of_replicas': '1'} of search-new-index, the next sync will try again: Oops"
+    )
+    # the settings to restore are still in the index for the next sync
+    assert es.es_management_client.update_index_meta.await_count == 1
+
+
 def set_responses(mock_responses, ts=None):
     if ts is None:
         ts = datetime.datetime.now().isoformat()
@@ -227,37 +365,36 @@ def set_responses(mock_responses, ts=None):
         payload={"_id": "1"},
         headers=headers,
     )
+    mock_responses.get(
+        "http://nowhere.com:9200/search-some-index/_mapping",
+        payload={"search-some-index": {"mappings": {}}},
+        headers=headers,
+    )
     source_1 = {"id": "1", "_timestamp": ts}
     source_2 = {"id": "2", "_timestamp": ts}
 
     mock_responses.post(
-        "http://nowhere.com:9200/search-some-index/_search?scroll=5m",
+        "http://nowhere.com:9200/search-some-index/_pit?keep_alive=5m",
+        payload={"id": "1234"},
+        headers=headers,
+    )
+    mock_responses.post(
+        "http://nowhere.com:9200/_search",
         payload={
-            "_scroll_id": "1234",
+            "pit_id": "1234",
             "_shards": {},
             "hits": {
                 "hits": [
-                    {"_id": "1", "_source": source_1},
-                    {"_id": "2", "_source": source_2},
+                    {"_id": "1", "_source": source_1, "sort": [1]},
+                    {"_id": "2", "_source": source_2, "sort": [2]},
                 ]
             },
         },
         headers=headers,
     )
     mock_responses.delete(
-        "http://nowhere.com:9200/_search/scroll",
-        headers=headers,
-    )
-    mock_responses.post(
-        "http://nowhere.com:9200/_search/scroll",
-        payload={
-            "hits": {
-                "hits": [
-                    {"_id": "1", "_source": source_1},
-                    {"_id": "2", "_source": source_2},
-                ]
-            }
-        },
+        "http://nowhere.com:9200/_pit",
+        payload={"succeeded": True, "num_freed": 1},
         headers=headers,
     )
 
@@ -1004,6 +1141,15 @@ async def test_get_docs_incrementally(
             created(1),
             deleted(1),
         ),
+        (
+            # the index holds the serialized timestamp of the same instant
+            [{"_id": DOC_ONE_ID, "_timestamp": TIMESTAMP.isoformat()}],
+            [(DOC_ONE, None, None)],
+            [end_docs_operation()],
+            updated(0),
+            created(0),
+            deleted(0),
+        ),
     ],
 )
 @mock.patch(
@@ -1039,11 +1185,37 @@ async def test_get_access_control_docs(
     assert queue_called_with_operations(queue, expected_queue_operations)
 
 
+@pytest.mark.parametrize(
+    "timestamp, expected_key",
+    [
+        (TIMESTAMP, 1672531200000000),
+        ("2023-01-01T00:00:00", 1672531200000000),
+        ("2023-01-01T00:00:00Z", 1672531200000000),
+        ("2023-01-01T01:00:00+01:00", 1672531200000000),
+        ("2023-01-01T00:00:00.000001+00:00", 1672531200000001),
+        # parsing would drop the nanoseconds
+        ("2023-01-01T00:00:00.123456789+00:00", "2023-01-01T00:00:00.123456789+00:00"),
+        ("2023-01-01T00:00:00.123456001Z", "2023-01-01T00:00:00.123456001Z"),
+        ("Sun, 01 Jan 2023 00:00:00 GMT", "Sun, 01 Jan 2023 00:00:00 GMT"),
+        (None, None),
+    ],
+)
+def test_timestamp_key(timestamp, expected_key):
+    assert timestamp_key(timestamp) == expected_key
+
+
 STATS = {
     "index": {"1": 1},
     "update": {"2": 1},
     "delete": {"3": 0},
 }
+# the bulk payload the Sink sends for the operations in STATS
+STATS_PAYLOAD = (
+    b'{"index":{"_index":"some-index","_id":"1"}}\n{"id":"1"}\n'
+    b'{"update":{"_index":"some-index","_id":"2"}}\n'
+    b'{"doc":{"id":"2"},"doc_as_upsert":true}\n'
+    b'{"delete":{"_index":"some-index","_id":"3"}}\n'
+)
 
 INDEX_ITEM = {"index": {"_id": "1", "result": "created"}}
 FAILED_INDEX_ITEM = {"index": {"_id": "1"}}
@@ -1178,7 +1350,10 @@ async def test_batch_bulk_with_retry():
         client.client.bulk = AsyncMock(
             side_effect=[first_call_error, second_call_result]
         )
-        await sink._batch_bulk([], {OP_INDEX: {}, OP_UPDATE: {}, OP_DELETE: {}})
+        await sink._batch_bulk(
+            b'{"index":{"_index":"some-index","_id":"1"}}\n{"id":"1"}\n',
+            {OP_INDEX: {"1": 20}, OP_UPDATE: {}, OP_DELETE: {}},
+        )
 
         assert client.client.bulk.await_count == 2
 
@@ -1213,7 +1388,10 @@ async def test_batch_bulk_with_errors(patch_logger):
             "items": [{"index": {"_id": "1", "error": error}}],
         }
         client.client.bulk = AsyncMock(return_value=mock_result)
-        await sink._batch_bulk([], {OP_INDEX: {"1": 20}, OP_UPDATE: {}, OP_DELETE: {}})
+        await sink._batch_bulk(
+            b'{"index":{"_index":"some-index","_id":"1"}}\n{"id":"1"}\n',
+            {OP_INDEX: {"1": 20}, OP_UPDATE: {}, OP_DELETE: {}},
+        )
         patch_logger.assert_present(f"operation index failed for doc 1, {error}")
 
 
@@ -1277,6 +1455,31 @@ async def test_extractor_put_doc():
     queue.put.assert_awaited_once_with(doc)
 
 
+@pytest.mark.asyncio
+async def test_extractor_enqueue_docs_to_delete():
+    queue = Mock()
+    queue.put = AsyncMock()
+    extractor = Extractor(
+        None,
+        queue,
+        INDEX,
+    )
+    existing_ids = {"1": None, "2": None}
+
+    await extractor.enqueue_docs_to_delete(existing_ids)
+
+    queue.put.assert_has_awaits(
+        [
+            call({"_op_type": OP_DELETE, "_index": INDEX, "_id": "1"}),
+            call({"_op_type": OP_DELETE, "_index": INDEX, "_id": "2"}),
+        ],
+        any_order=True,
+    )
+    assert extractor.counters.get(DELETES_QUEUED) == 2
+    # ids are released as their deletions are queued
+    assert existing_ids == {}
+
+
 @pytest.mark.asyncio
 @mock.patch(
     "connectors.es.management_client.ESManagementClient.yield_existing_documents_metadata"
@@ -1305,6 +1508,92 @@ async def test_extractor_get_docs_when_downloads_fail(
     concurrent_tasks_cancel.assert_called_once()
 
 
+@pytest.mark.asyncio
+@mock.patch(
+    "connectors.es.management_client.ESManagementClient.yield_existing_documents_metadata"
+)
+async def test_extractor_get_docs_bounds_concurrent_downloads(
+    yield_existing_documents_metadata,
+):
+    queue = Mock()
+    queue.put = AsyncMock()
+    yield_existing_documents_metadata.return_value = AsyncIterator([])
+
+    running = 0
+    max_running = 0
+
+    def slow_lazy_download_fake():
+        async def lazy_download(**kwargs):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"_attachment": "content"}
+
+        return lazy_download
+
+    docs_from_source = []
+    for i in range(10):
+        doc = {"_id": str(i), "_timestamp": TIMESTAMP}
+        docs_from_source.append((doc, slow_lazy_download_fake(), "index"))
+    doc_generator = AsyncIterator(docs_from_source)
+
+    extractor = await setup_extractor(queue, content_extraction_enabled=True)
+    extractor.concurrent_downloads = 2
+
+    await extractor.run(doc_generator, JobType.FULL)
+
+    # downloads only start once a slot is free, not when the document is read
+    assert max_running == 2
+    assert extractor.counters.get(BIN_DOCS_DOWNLOADED) == 10
+
+
+@pytest.mark.asyncio
+@mock.patch(
+    "connectors.es.management_client.ESManagementClient.yield_existing_documents_metadata"
+)
+async def test_extractor_get_docs_queues_docs_while_scanning_existing_ids(
+    yield_existing_documents_metadata,
+):
+    docs_queued = asyncio.Event()
+    queued = []
+
+    async def put(doc):
+        queued.append(doc)
+        if len(queued) == 3:
+            docs_queued.set()
+
+    queue = Mock()
+    queue.put = AsyncMock(side_effect=put)
+
+    async def existing_documents_metadata(index):
+        # the index is only scanned once every document has been queued
+        await docs_queued.wait()
+        for doc_id in ["1", "2", "9"]:
+            yield doc_id, TIMESTAMP
+
+    yield_existing_documents_metadata.side_effect = existing_documents_metadata
+    doc_generator = AsyncIterator(
+        [({"_id": str(i), "_timestamp": TIMESTAMP}, None, "index") for i in range(3)]
+    )
+
+    extractor = await setup_extractor(queue)
+
+    await extractor.run(doc_generator, JobType.FULL)
+
+    assert [(doc["_op_type"], doc["_id"]) for doc in queued[:-1]] == [
+        ("index", "0"),
+        ("index", "1"),
+        ("index", "2"),
+        (OP_DELETE, "9"),
+    ]
+    assert queued[-1] == end_docs_operation()
+    assert extractor.counters.get(CREATES_QUEUED) == 1
+    assert extractor.counters.get(UPDATES_QUEUED) == 2
+    assert extractor.counters.get(DELETES_QUEUED) == 1
+
+
 @pytest.mark.asyncio
 async def test_force_canceled_extractor_put_doc():
     doc = {"id": 123}
@@ -1505,7 +1794,6 @@ async def test_should_not_log_bulk_operations_if_doc_id_tracing_is_disabled(
 ):
     action = "create"
     result = "created"
-    operations = []
     client = Mock()
     client.bulk_insert = AsyncMock(
         return_value={"items": [successful_bulk_action(DOC_ONE_ID, action, result)]}
@@ -1522,7 +1810,7 @@ async def test_should_not_log_bulk_operations_if_doc_id_tracing_is_disabled(
         enable_bulk_operations_logging=False,
     )
 
-    await sink._batch_bulk(operations, STATS)
+    await sink._batch_bulk(STATS_PAYLOAD, STATS)
 
     patch_logger.assert_not_present(
         successful_action_log_message(DOC_ONE_ID, action, result)
@@ -1590,7 +1878,6 @@ async def test_should_not_log_bulk_operations_if_doc_id_tracing_is_disabled(
 async def test_should_log_bulk_operations_if_doc_id_tracing_is_enabled(
     patch_logger, operation_results, expected_logs
 ):
-    operations = []
     client = Mock()
     client.bulk_insert = AsyncMock(return_value={"items": operation_results})
     sink = Sink(
@@ -1605,7 +1892,7 @@ async def test_should_log_bulk_operations_if_doc_id_tracing_is_enabled(
         enable_bulk_operations_logging=True,
     )
 
-    await sink._batch_bulk(operations, STATS)
+    await sink._batch_bulk(STATS_PAYLOAD, STATS)
 
     for log in expected_logs:
         patch_logger.assert_present(log)
@@ -1613,7 +1900,6 @@ async def test_should_log_bulk_operations_if_doc_id_tracing_is_enabled(
 
 @pytest.mark.asyncio
 async def test_should_log_error_when_id_is_missing(patch_logger):
-    operations = []
     client = Mock()
     # item missing id
     item = {"index": {"result": "created"}}
@@ -1635,7 +1921,7 @@ async def test_should_log_error_when_id_is_missing(patch_logger):
         enable_bulk_operations_logging=True,
     )
 
-    await sink._batch_bulk(operations, STATS)
+    await sink._batch_bulk(STATS_PAYLOAD, STATS)
 
     patch_logger.assert_present(f"Could not retrieve '_id' for document {item}")
 
@@ -1647,7 +1933,6 @@ async def test_should_log_error_when_id_is_missing(patch_logger):
 
 @pytest.mark.asyncio
 async def test_should_log_error_when_unknown_action_item_returned(patch_logger):
-    operations = []
     client = Mock()
 
     # item with unknown action item
@@ -1670,7 +1955,7 @@ async def test_should_log_error_when_unknown_action_item_returned(patch_logger):
         enable_bulk_operations_logging=True,
     )
 
-    await sink._batch_bulk(operations, STATS)
+    await sink._batch_bulk(STATS_PAYLOAD, STATS)
 
     patch_logger.assert_present(
         f"Unknown action item returned from _bulk API for item {item}"
@@ -1680,3 +1965,435 @@ async def test_should_log_error_when_unknown_action_item_returned(patch_logger):
     patch_logger.assert_present(
         successful_action_log_message(DOC_ONE_ID, "create", "created")
     )
+
+
+async def sink_queue(docs):
+    queue = asyncio.Queue()
+    for doc in docs:
+        await queue.put((1, doc))
+    return queue
+
+
+def sent_payloads(client):
+    return [call_args[0][0] for call_args in client.bulk_insert.await_args_list]
+
+
+@pytest.mark.asyncio
+async def test_sink_sends_ndjson_payload():
+    client = Mock()
+    client.bulk_insert = AsyncMock(return_value={"items": []})
+    queue = await sink_queue(
+        [
+            index_operation(DOC_ONE),
+            update_operation(DOC_TWO),
+            delete_operation(DOC_THREE),
+            end_docs_operation(),
+        ]
+    )
+    sink = Sink(
+        client=client,
+        queue=queue,
+        chunk_size=10,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=1,
+        max_concurrency=1,
+        max_retries=3,
+        retry_interval=10,
+    )
+
+    await sink.run()
+
+    assert [payload.splitlines() for payload in sent_payloads(client)] == [
+        [
+            b'{"index":{"_index":"some-index","_id":"1"}}',
+            b'{"_timestamp":"2023-01-01T00:00:00","id":"1"}',
+            b'{"update":{"_index":"some-index","_id":"2"}}',
+            b'{"doc":{"_timestamp":"2023-01-01T00:00:00","id":"2"},"doc_as_upsert":true}',
+            b'{"delete":{"_index":"some-index","_id":"3"}}',
+        ]
+    ]
+
+
+@pytest.mark.parametrize(
+    "field, expected_line",
+    [
+        # orjson rejects both, they are serialized like the json module does
+        ("lone \ud800 surrogate", b'{"field":"lone \xed\xa0\x80 surrogate"}'),
+        (2**64, b'{"field":18446744073709551616}'),
+    ],
+)
+@pytest.mark.asyncio
+async def test_sink_serializes_values_rejected_by_orjson(field, expected_line):
+    client = Mock()
+    client.bulk_insert = AsyncMock(return_value={"items": []})
+    queue = await sink_queue(
+        [
+            {
+                "_op_type": OP_INDEX,
+                "_index": INDEX,
+                "_id": "1",
+                "doc": {"field": field},
+            },
+            {
+                "_op_type": OP_UPDATE,
+                "_index": INDEX,
+                "_id": "2",
+                "doc": {"field": field},
+            },
+            end_docs_operation(),
+        ]
+    )
+    sink = Sink(
+        client=client,
+        queue=queue,
+        chunk_size=10,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=1,
+        max_concurrency=1,
+        max_retries=3,
+        retry_interval=10,
+    )
+
+    await sink.run()
+
+    assert sink.error is None
+    assert [payload.splitlines() for payload in sent_payloads(client)] == [
+        [
+            b'{"index":{"_index":"some-index","_id":"1"}}',
+            expected_line,
+            b'{"update":{"_index":"some-index","_id":"2"}}',
+            b'{"doc":' + expected_line + b',"doc_as_upsert":true}',
+        ]
+    ]
+
+
+@pytest.mark.parametrize(
+    "operation, doc_id",
+    [
+        (OP_INDEX, 'with "quotes" and \\ backslash'),
+        (OP_UPDATE, 42),
+        (OP_DELETE, "1"),
+    ],
+)
+def test_sink_writes_action_line_like_json(operation, doc_id):
+    sink = Sink(
+        client=Mock(),
+        queue=Mock(),
+        chunk_size=10,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=1,
+        max_concurrency=1,
+        max_retries=3,
+        retry_interval=10,
+    )
+    doc = {"_id": doc_id, "_index": "some-index", "doc": {"id": doc_id}}
+
+    buffer = io.BytesIO()
+    sink._write_bulk_op(buffer, doc, operation)
+    sink._write_bulk_op(buffer, doc, operation)
+
+    action_lines = buffer.getvalue().splitlines()[:: 1 if operation == OP_DELETE else 2]
+    assert [json.loads(line) for line in action_lines] == [
+        {operation: {"_index": "some-index", "_id": doc_id}}
+    ] * 2
+
+
+@pytest.mark.parametrize(
+    "chunk_size, chunk_mem_size, expected_lines_per_request",
+    [
+        # `chunk_size` counts NDJSON lines, two per index and one per delete
+        (3, 1, [3, 3]),
+        (10, 0, [2, 1, 1, 2]),
+    ],
+)
+@pytest.mark.asyncio
+async def test_sink_splits_payloads(
+    chunk_size, chunk_mem_size, expected_lines_per_request
+):
+    client = Mock()
+    client.bulk_insert = AsyncMock(return_value={"items": []})
+    queue = await sink_queue(
+        [
+            index_operation(DOC_ONE),
+            delete_operation(DOC_TWO),
+            delete_operation(DOC_THREE),
+            index_operation(DOC_FOUR),
+            end_docs_operation(),
+        ]
+    )
+    sink = Sink(
+        client=client,
+        queue=queue,
+        chunk_size=chunk_size,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=chunk_mem_size,
+        max_concurrency=1,
+        max_retries=3,
+        retry_interval=10,
+    )
+
+    await sink.run()
+
+    assert [
+        len(payload.splitlines()) for payload in sent_payloads(client)
+    ] == expected_lines_per_request
+
+
+@pytest.mark.asyncio
+async def test_sink_flushes_pending_payload_after_interval():
+    client = Mock()
+    client.bulk_insert = AsyncMock(return_value={"items": []})
+    queue = await sink_queue([index_operation(DOC_ONE)])
+    sink = Sink(
+        client=client,
+        queue=queue,
+        chunk_size=10,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=1,
+        max_concurrency=1,
+        max_retries=3,
+        retry_interval=10,
+        chunk_flush_interval=0.01,
+    )
+
+    sink_task = asyncio.create_task(sink.run())
+    await asyncio.sleep(0.1)
+
+    # the first doc is sent while the sink is still waiting for more
+    assert client.bulk_insert.await_count == 1
+
+    await queue.put((1, end_docs_operation()))
+    await sink_task
+
+    assert client.bulk_insert.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_sink_sends_last_payload_while_others_are_in_flight():
+    in_flight = 0
+    max_in_flight = 0
+    release = asyncio.Event()
+
+    async def bulk_insert(operations, pipeline):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await release.wait()
+        in_flight -= 1
+        return {"items": []}
+
+    client = Mock()
+    client.bulk_insert = AsyncMock(side_effect=bulk_insert)
+    queue = await sink_queue(
+        [
+            index_operation(DOC_ONE),
+            index_operation(DOC_TWO),
+            index_operation(DOC_THREE),
+            end_docs_operation(),
+        ]
+    )
+    sink = Sink(
+        client=client,
+        queue=queue,
+        chunk_size=4,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=1,
+        max_concurrency=2,
+        max_retries=3,
+        retry_interval=10,
+    )
+
+    sink_task = asyncio.create_task(sink.run())
+    await asyncio.sleep(0.01)
+    release.set()
+    await sink_task
+
+    assert client.bulk_insert.await_count == 2
+    assert max_in_flight == 2
+
+
+def bulk_item(doc_id, action, status, result=None):
+    item = {"_id": doc_id, "status": status}
+    if result is None:
+        item["error"] = {"type": "es_rejected_execution_exception"}
+    else:
+        item["result"] = result
+    return {action: item}
+
+
+@pytest.mark.asyncio
+async def test_batch_bulk_retries_rejected_items():
+    client = Mock()
+    client.bulk_insert = AsyncMock(
+        side_effect=[
+            {
+                "errors": True,
+                "items": [
+                    bulk_item("1", "index", 201, "created"),
+                    bulk_item("2", "index", 429),
+                    bulk_item("3", "delete", 503),
+                ],
+            },
+            {
+                "errors": True,
+                "items": [
+                    bulk_item("2", "index", 201, "created"),
+                    bulk_item("3", "delete", 429),
+                ],
+            },
+            {"errors": False, "items": [bulk_item("3", "delete", 200, "deleted")]},
+        ]
+    )
+    sink = Sink(
+        client=client,
+        queue=None,
+        chunk_size=0,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=0,
+        max_concurrency=0,
+        max_retries=3,
+        retry_interval=10,
+    )
+    operations = (
+        b'{"index":{"_index":"some-index","_id":"1"}}\n{"id":"1"}\n'
+        b'{"index":{"_index":"some-index","_id":"2"}}\n{"id":"2"}\n'
+        b'{"delete":{"_index":"some-index","_id":"3"}}\n'
+    )
+
+    with mock.patch.object(asyncio, "sleep") as sleep_mock:
+        res = await sink._batch_bulk(
+            operations, {OP_INDEX: {"1": 1, "2": 1}, OP_UPDATE: {}, OP_DELETE: {"3": 0}}
+        )
+
+    assert sent_payloads(client)[1:] == [
+        b'{"index":{"_index":"some-index","_id":"2"}}\n{"id":"2"}\n'
+        b'{"delete":{"_index":"some-index","_id":"3"}}\n',
+        b'{"delete":{"_index":"some-index","_id":"3"}}\n',
+    ]
+    assert sleep_mock.await_count == 2
+    assert not res["errors"]
+    assert sink.counters.get(INDEXED_DOCUMENT_COUNT) == 2
+    assert sink.counters.get(DELETED_DOCUMENT_COUNT) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_bulk_stops_retrying_rejected_items():
+    client = Mock()
+    client.bulk_insert = AsyncMock(
+        return_value={"errors": True, "items": [bulk_item("1", "index", 429)]}
+    )
+    sink = Sink(
+        client=client,
+        queue=None,
+        chunk_size=0,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=0,
+        max_concurrency=0,
+        max_retries=3,
+        retry_interval=10,
+    )
+    operations = b'{"index":{"_index":"some-index","_id":"1"}}\n{"id":"1"}\n'
+
+    with mock.patch.object(asyncio, "sleep"):
+        res = await sink._batch_bulk(
+            operations, {OP_INDEX: {"1": 1}, OP_UPDATE: {}, OP_DELETE: {}}
+        )
+
+    assert client.bulk_insert.await_count == 4
+    assert res["errors"]
+    assert sink.counters.get(INDEXED_DOCUMENT_COUNT) == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_bulk_counts_failed_item_retries_as_attempts():
+    error_meta = Mock()
+    error_meta.status = 429
+    client = Mock()
+    client.bulk_insert = AsyncMock(
+        side_effect=[
+            {"errors": True, "items": [bulk_item("1", "index", 429)]},
+            ApiError(429, meta=error_meta, body="error"),
+            {"errors": False, "items": [bulk_item("1", "index", 201, "created")]},
+        ]
+    )
+    sink = Sink(
+        client=client,
+        queue=None,
+        chunk_size=0,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=0,
+        max_concurrency=0,
+        max_retries=3,
+        retry_interval=10,
+    )
+    operations = b'{"index":{"_index":"some-index","_id":"1"}}\n{"id":"1"}\n'
+
+    with mock.patch.object(asyncio, "sleep") as sleep_mock:
+        res = await sink._batch_bulk(
+            operations, {OP_INDEX: {"1": 1}, OP_UPDATE: {}, OP_DELETE: {}}
+        )
+
+    # the client does not retry on top of the item retries
+    assert (
+        client.bulk_insert.await_args_list[1:]
+        == [call(operations, "pipeline", with_retries=False)] * 2
+    )
+    assert sleep_mock.await_count == 2
+    assert not res["errors"]
+    assert sink.counters.get(INDEXED_DOCUMENT_COUNT) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_bulk_stops_retrying_rejected_items_when_canceled():
+    client = Mock()
+    client.bulk_insert = AsyncMock(
+        return_value={"errors": True, "items": [bulk_item("1", "index", 429)]}
+    )
+    sink = Sink(
+        client=client,
+        queue=None,
+        chunk_size=0,
+        pipeline={"name": "pipeline"},
+        chunk_mem_size=0,
+        max_concurrency=0,
+        max_retries=3,
+        retry_interval=10,
+    )
+    operations = b'{"index":{"_index":"some-index","_id":"1"}}\n{"id":"1"}\n'
+
+    bulk_task = asyncio.create_task(
+        sink._batch_bulk(operations, {OP_INDEX: {"1": 1}, OP_UPDATE: {}, OP_DELETE: {}})
+    )
+    await asyncio.sleep(0.01)
+    # the backoff before the first retry is interrupted
+    sink.force_cancel()
+    res = await asyncio.wait_for(bulk_task, 1)
+
+    assert client.bulk_insert.await_count == 1
+    assert res["errors"]
+
+
+def test_populate_stats_throttles_stats_logging():
+    logger_ = Mock()
+    logger_.isEnabledFor = Mock(return_value=True)
+    sink = Sink(
+        client=None,
+        queue=None,
+        chunk_size=0,
+        pipeline=None,
+        chunk_mem_size=0,
+        max_concurrency=0,
+        max_retries=3,
+        retry_interval=10,
+        logger_=logger_,
+    )
+    res = {"items": [bulk_item("1", OP_INDEX, 201, "created")]}
+
+    with mock.patch("time.monotonic", side_effect=[100, 100.5, 101]):
+        for _ in range(3):
+            sink._populate_stats(
+                {OP_INDEX: {"1": 1}, OP_UPDATE: {}, OP_DELETE: {}}, res
+            )
+
+    assert sink.counters.get(INDEXED_DOCUMENT_COUNT) == 3
+    assert logger_.debug.call_count == 2
@@ -4,7 +4,7 @@
 # you may not use this file except in compliance with the Elastic License 2.0.
 #
 import asyncio
-from unittest.mock import ANY, AsyncMock, Mock, patch
+from unittest.mock import ANY, AsyncMock, Mock, call, patch
 
 import pytest
 from elasticsearch import (
@@ -529,6 +529,20 @@ async def test_sync_job_runner(job_type, sync_cursor, sync_orchestrator_mock):
     sync_job_runner.sync_orchestrator.cancel.assert_called_once()
 
 
+@pytest.mark.parametrize("index_empty", [True, False])
+@pytest.mark.asyncio
+async def test_sync_job_runner_initial_load(index_empty, sync_orchestrator_mock):
+    sync_orchestrator_mock.prepare_content_index.return_value = index_empty
+    sync_job_runner = create_runner(job_type=JobType.FULL, sync_cursor=SYNC_CURSOR)
+    await sync_job_runner.execute()
+
+    # only the sync filling an empty index loads it with tuned settings
+    assert (
+        sync_orchestrator_mock.async_bulk.await_args.kwargs["initial_load"]
+        == index_empty
+    )
+
+
 @pytest.mark.parametrize(
     "job_type, sync_cursor",
     [
@@ -659,6 +673,56 @@ async def test_sync_job_runner_reporting_metadata(
     )
 
 
+@pytest.mark.asyncio
+async def test_update_ingestion_stats_skips_unchanged_stats(sync_orchestrator_mock):
+    first_stats = {
+        "indexed_document_count": 15,
+        "indexed_document_volume": 230,
+        "deleted_document_count": 10,
+    }
+    second_stats = first_stats | {"indexed_document_count": 20}
+    sync_orchestrator_mock.ingestion_stats.side_effect = [
+        first_stats,
+        first_stats,
+        second_stats,
+    ]
+    sync_job_runner = create_runner()
+    sync_job_runner.sync_orchestrator = sync_orchestrator_mock
+    sync_job_runner.sync_job.reload.side_effect = [
+        None,
+        None,
+        None,
+        DocumentNotFoundError(),
+    ]
+
+    await sync_job_runner.update_ingestion_stats(0)
+
+    assert sync_job_runner.sync_job.update_metadata.await_args_list == [
+        call(ingestion_stats=first_stats),
+        call(ingestion_stats=second_stats),
+    ]
+
+
+@pytest.mark.asyncio
+@patch("connectors.sync_job_runner.JOB_REPORTING_HEARTBEAT_INTERVAL", 0)
+async def test_update_ingestion_stats_reports_unchanged_stats_periodically(
+    sync_orchestrator_mock,
+):
+    ingestion_stats = {
+        "indexed_document_count": 15,
+        "indexed_document_volume": 230,
+        "deleted_document_count": 10,
+    }
+    sync_orchestrator_mock.ingestion_stats.return_value = ingestion_stats
+    sync_job_runner = create_runner()
+    sync_job_runner.sync_orchestrator = sync_orchestrator_mock
+    sync_job_runner.sync_job.reload.side_effect = [None, None, DocumentNotFoundError()]
+
+    await sync_job_runner.update_ingestion_stats(0)
+
+    assert sync_job_runner.sync_job.update_metadata.await_count == 2
+
+
 @pytest.mark.parametrize(
     "job_type", [JobType.FULL, JobType.INCREMENTAL, JobType.ACCESS_CONTROL]
 )
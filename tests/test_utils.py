@@ -8,6 +8,7 @@ import base64
 import binascii
 import contextlib
 import functools
+import json
 import os
 import random
 import ssl
@@ -257,6 +258,43 @@ def test_mem_queue_speed():
     assert quotient < 30
 
 
+def comments(count):
+    return [
+        {
+            "id": str(i),
+            "author": {"name": f"user {i}", "active": False, "manager": None},
+            "likes": i % 5,
+            "deleted": False,
+            "parent": None,
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize(
+    "ob",
+    [
+        "small stuff",
+        {"id": "1", "title": "Some title", "body": "lorem ipsum " * 300},
+        (10, {"tags": ["a", "b"], "meta": {"size": 12.5, "deleted": None}}),
+        {"_timestamp": datetime(2023, 1, 1), "ids": {1, 2, 3}},
+        # keys, `None`, booleans and small ints are shared between the records
+        json.loads(json.dumps({"id": "1", "comments": comments(50)})),
+        {"tags": ["a"] * 500},
+    ],
+)
+def test_get_size_is_close_to_asizeof(ob):
+    assert get_size(ob) == pytest.approx(asizeof.asizeof(ob), rel=0.05)
+
+
+def test_get_size_counts_shared_objects_once():
+    shared = ["a" * 1000]
+    cyclic = {"shared": shared, "again": shared}
+    cyclic["self"] = cyclic
+
+    assert get_size(cyclic) < get_size(shared) * 2
+
+
 @pytest.mark.asyncio
 async def test_mem_queue_race():
     item = "small stuff"
@@ -594,6 +632,20 @@ async def test_concurrent_runner_join():
     assert 3 in results
 
 
+@pytest.mark.asyncio
+async def test_concurrent_runner_only_keeps_running_tasks():
+    async def coroutine():
+        await asyncio.sleep(0)
+
+    runner = ConcurrentTasks(max_concurrency=2)
+    for _ in range(100):
+        await runner.put(coroutine)
+        assert len(runner) <= 2
+
+    await runner.join()
+    assert len(runner) == 0
+
+
 @pytest.mark.asyncio
 async def test_concurrent_tasks_raise_any_exception():
     async def return_1():